@@ -0,0 +1,185 @@
+"""
+Camera Pipeline - Capture, process and display on separate threads
+Copyright (c) 2024 D-speedster (github.com/D-speedster)
+"""
+import threading
+import time
+from collections import namedtuple
+
+import cv2
+
+
+# frame: the webcam Frame it came from; info: text from the render stage
+Result = namedtuple('Result', 'frame image info detected')
+
+
+class CameraPipeline:
+    """Processes webcam frames on a worker thread while the webcam keeps
+    capturing on its own and the UI only displays finished results.
+
+    The worker always takes the newest captured frame, so when processing
+    is slower than the camera, stale frames are skipped instead of queued.
+    Processing is split into `detect(image)` (slow, e.g. face detection)
+    and `render(image, detections)` (fast, draws effects). Detection takes
+    at most `detect_share` of the worker's time and is skipped on frames
+    already older than `max_latency` seconds; those frames are rendered
+    with the last detections instead.
+
+    `on_result()` is called from the worker after each frame; the newest
+    Result is then available from `take()`. Every processed frame also
+    goes to `recorder` (a VideoRecorder) when one is set, stamped with its
+    capture time; pausing the pipeline pauses the recording too.
+    """
+
+    def __init__(self, webcam, detect=None, render=None, max_latency=0.1, detect_share=0.5):
+        self.webcam = webcam
+        self.max_latency = max_latency
+        self.detect_share = detect_share
+        self.on_result = None
+        self.recorder = None
+        self.paused = False
+        self.fps = 0.0
+        self.skipped_detections = 0
+        self._stages = (detect, render)
+        self._result = None
+        self._running = False
+        self._thread = None
+        self._resume = threading.Event()
+
+    def set_stages(self, detect=None, render=None):
+        """Swap the processing functions; previous detections are dropped."""
+        self._stages = (detect, render)
+
+    def start(self, on_result=None):
+        if self._running:
+            return
+        self.on_result = on_result
+        self.fps = 0.0
+        self.skipped_detections = 0
+        self._result = None
+        self._running = True
+        self._resume.set()
+        self._thread = threading.Thread(target=self._run, name="pe_camera_process", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._resume.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+        self._thread = None
+
+    def pause(self, paused=True):
+        self.paused = paused
+        recorder = self.recorder
+        if paused:
+            self._resume.clear()
+            if recorder is not None:
+                recorder.pause()
+        else:
+            if recorder is not None:
+                recorder.resume()
+            self._resume.set()
+
+    def take(self):
+        """Newest result not taken yet, or None."""
+        result, self._result = self._result, None
+        return result
+
+    @property
+    def stats(self):
+        return {
+            'capture_fps': self.webcam.fps,
+            'process_fps': self.fps,
+            'dropped': self.webcam.dropped,
+            'skipped_detections': self.skipped_detections,
+        }
+
+    def _run(self):
+        last = -1
+        detections = None
+        detect_cost = 0.0
+        detect_end = 0.0
+        detected_before = False
+        stages = None
+        prev = interval = None
+        while self._running:
+            self._resume.wait()
+            frame = self.webcam.wait_frame(last, timeout=0.2)
+            if not self._running:
+                break
+            if frame is None:
+                if not self.webcam.is_running:
+                    break
+                continue
+            last = frame.index
+
+            current = self._stages
+            if current is not stages:
+                stages, detections = current, None
+            detect, render = stages
+
+            start = time.monotonic()
+            detected = False
+            try:
+                if detect is not None:
+                    lagging = start - frame.timestamp > self.max_latency
+                    idle = start - detect_end
+                    due = idle >= detect_cost * (1.0 / self.detect_share - 1.0)
+                    if detections is None or (due and not lagging):
+                        detections = detect(frame.image)
+                        detect_end = time.monotonic()
+                        # averaged, so an occasional slow call (a tracker's
+                        # periodic full detection) doesn't stall the cheap ones
+                        cost = detect_end - start
+                        detect_cost = cost if detected_before else detect_cost * 0.8 + cost * 0.2
+                        detected_before = True
+                        detected = True
+                    else:
+                        self.skipped_detections += 1
+                if render is not None:
+                    image, info = render(frame.image, detections)
+                else:
+                    image, info = frame.image, ""
+            except Exception as e:
+                image, info = frame.image, str(e)
+
+            now = time.monotonic()
+            if prev is not None:
+                interval = now - prev if interval is None else interval * 0.9 + (now - prev) * 0.1
+                self.fps = 1.0 / interval if interval > 0 else 0.0
+            prev = now
+            recorder = self.recorder
+            if recorder is not None:
+                recorder.write(image, frame.timestamp)
+            self._result = Result(frame, image, info, detected)
+            if not self._notify():
+                return
+        if self._running:
+            # the webcam stopped on its own; let the UI show its error
+            self._notify()
+
+    def _notify(self):
+        if self.on_result is None:
+            return True
+        try:
+            self.on_result()
+        except RuntimeError:
+            # the window was closed while this frame was processed
+            return False
+        return True
+
+
+def draw_overlay(image, stats):
+    """Copy of `image` with the pipeline's rates in the top-left corner."""
+    lines = [
+        f"Capture {stats['capture_fps']:.1f} fps",
+        f"Process {stats['process_fps']:.1f} fps",
+        f"Dropped {stats['dropped']}  Detect skipped {stats['skipped_detections']}",
+    ]
+    result = image.copy()
+    for i, text in enumerate(lines):
+        y = 22 + i * 22
+        cv2.putText(result, text, (10, y), cv2.FONT_HERSHEY_SIMPLEX, 0.55, (0, 0, 0), 3)
+        cv2.putText(result, text, (10, y), cv2.FONT_HERSHEY_SIMPLEX, 0.55, (0, 255, 255), 1)
+    return result
@@ -0,0 +1,118 @@
+"""
+Recorder - Background video writer with timestamp-driven frame timing
+Copyright (c) 2024 D-speedster (github.com/D-speedster)
+"""
+import queue
+import threading
+import time
+
+import cv2
+
+
+class VideoRecorder:
+    """Writes frames to a video file on its own thread.
+
+    `write()` only queues the frame, so recording never holds up whoever
+    produces frames; if the queue is full the frame is dropped. Frames
+    carry their capture timestamp, and output frame n shows whatever frame
+    was newest at `n / fps` seconds after the first one. Slow stretches
+    therefore repeat frames and fast ones skip them, and the file plays
+    back at real speed whatever rate frames actually arrived at.
+
+    The writer is opened on the first frame, with that frame's size.
+    Time between `pause()` and `resume()` is left out of the file.
+    """
+
+    def __init__(self, path, fps=30.0, fourcc='XVID', is_color=True, max_pending=64):
+        self.path = path
+        self.fps = float(fps)
+        self.fourcc = fourcc
+        self.is_color = is_color
+        self.error = None
+        self.written = 0
+        self.duplicated = 0
+        self.dropped = 0
+        self._queue = queue.Queue(max_pending)
+        self._paused_at = None
+        self._thread = threading.Thread(target=self._run, name="pe_recorder", daemon=True)
+        self._thread.start()
+
+    def write(self, image, timestamp):
+        """Queue `image` captured at `timestamp` (seconds, monotonic)."""
+        if self.error is not None:
+            return False
+        try:
+            self._queue.put_nowait((image, timestamp))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def pause(self):
+        if self._paused_at is None:
+            self._paused_at = time.monotonic()
+
+    def resume(self):
+        if self._paused_at is not None:
+            gap, self._paused_at = time.monotonic() - self._paused_at, None
+            self._queue.put((None, gap))
+
+    def stop(self):
+        """Write what is queued, close the file and wait for the thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _open(self, image):
+        h, w = image.shape[:2]
+        writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*self.fourcc),
+                                 self.fps, (w, h), self.is_color)
+        if not writer.isOpened():
+            self.error = f"Could not open {self.path} for writing"
+            return None
+        return writer
+
+    def _prepare(self, image):
+        if not self.is_color and image.ndim == 3:
+            return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        return image
+
+    def _run(self):
+        writer = None
+        start = None
+        held = None      # newest frame, not written yet
+        slot = 0
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if self.error is not None:
+                continue
+            image, timestamp = item
+            if image is None:
+                # resumed after a pause: slots restart where they stopped
+                if start is not None:
+                    start += timestamp
+                continue
+            image = self._prepare(image)
+            if writer is None:
+                writer = self._open(image)
+                if writer is None:
+                    continue
+                start = timestamp
+            else:
+                # every slot up to this frame's time shows the frame before it
+                repeats = 0
+                while start + slot / self.fps <= timestamp:
+                    writer.write(held)
+                    slot += 1
+                    repeats += 1
+                if repeats == 0:
+                    self.dropped += 1
+                self.written += repeats
+                self.duplicated += max(0, repeats - 1)
+            held = image
+        if writer is not None:
+            if held is not None:
+                writer.write(held)
+                self.written += 1
+            writer.release()
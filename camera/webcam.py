@@ -2,21 +2,57 @@
 Webcam - Camera capture functionality
 Copyright (c) 2024 D-speedster (github.com/D-speedster)
 """
+import threading
+import time
+from collections import deque, namedtuple
+
 import cv2
 
 
+# index counts every frame grabbed since start(); timestamp is time.monotonic()
+Frame = namedtuple('Frame', 'index timestamp image')
+
+# consecutive failed reads before the camera counts as gone
+MAX_READ_FAILURES = 30
+
+
 class Webcam:
-    def __init__(self):
+    """Grabs frames on its own thread into a small ring buffer.
+
+    The capture thread reads as fast as the camera delivers, so the camera
+    sets the frame rate rather than whoever polls it. Only the newest
+    `buffer_size` frames are kept and stale ones fall out unread; `dropped`
+    counts frames that were never taken. `latest()` never blocks, and
+    `wait_frame()` waits for a frame newer than the one a consumer has.
+    """
+
+    def __init__(self, buffer_size=3):
         self.camera = None
         self.is_running = False
         self.last_error = None
+        self.buffer_size = buffer_size
+        self.fps = 0.0
+        self.dropped = 0
+        self._ring = deque(maxlen=buffer_size)
+        self._thread = None
+        self._new_frame = threading.Condition()
+        self._taken = -1
         
     def start(self, camera_index=0):
         try:
             self.camera = cv2.VideoCapture(camera_index)
             if self.camera.isOpened():
+                # the driver's own queue would only add latency
+                self.camera.set(cv2.CAP_PROP_BUFFERSIZE, 1)
                 self.is_running = True
                 self.last_error = None
+                self.fps = 0.0
+                self.dropped = 0
+                self._taken = -1
+                self._ring.clear()
+                self._thread = threading.Thread(target=self._capture, args=(self.camera,),
+                                                name="pe_capture", daemon=True)
+                self._thread.start()
                 return True
             self.last_error = "Could not open camera"
         except Exception as e:
@@ -24,26 +60,92 @@ class Webcam:
         return False
         
     def stop(self):
-        if self.camera is not None:
-            try:
-                self.camera.release()
-            except Exception:
-                pass
-            self.is_running = False
+        self.is_running = False
+        with self._new_frame:
+            self._new_frame.notify_all()
+        thread, self._thread = self._thread, None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=1.0)
+        if thread is None and self.camera is not None:
+            self._release(self.camera)
+        # otherwise the capture thread releases it once read() returns
+        self.camera = None
+        
+    @staticmethod
+    def _release(camera):
+        try:
+            camera.release()
+        except Exception:
+            pass
             
+    def _capture(self, camera):
+        try:
+            self._read_frames(camera)
+        finally:
+            self._release(camera)
+            with self._new_frame:
+                self._new_frame.notify_all()
+                
+    def _read_frames(self, camera):
+        index = 0
+        interval = None
+        failures = 0
+        me = threading.current_thread()
+        # a thread left behind by a timed-out stop() must not outlive a restart
+        while self.is_running and self._thread is me:
+            try:
+                ret, image = camera.read()
+            except Exception as e:
+                self.last_error = str(e)
+                self.is_running = False
+                break
+            now = time.monotonic()
+            if not ret:
+                self.last_error = "Failed to read frame"
+                failures += 1
+                if failures >= MAX_READ_FAILURES:
+                    self.is_running = False
+                    break
+                time.sleep(0.01)
+                continue
+            failures = 0
+            if self._ring:
+                dt = now - self._ring[-1].timestamp
+                interval = dt if interval is None else interval * 0.9 + dt * 0.1
+                self.fps = 1.0 / interval if interval > 0 else 0.0
+            self._ring.append(Frame(index, now, image))
+            index += 1
+            with self._new_frame:
+                self._new_frame.notify_all()
+                
+    def latest(self, after=-1):
+        """Newest frame if its index is above `after`, otherwise None."""
+        try:
+            frame = self._ring[-1]
+        except IndexError:
+            return None
+        if frame.index <= after:
+            return None
+        if frame.index > self._taken:
+            # frames grabbed since the last one taken were never seen
+            if self._taken >= 0:
+                self.dropped += frame.index - self._taken - 1
+            self._taken = frame.index
+        return frame
+        
+    def wait_frame(self, after=-1, timeout=None):
+        """Block until a frame newer than `after` arrives (or stop())."""
+        with self._new_frame:
+            self._new_frame.wait_for(
+                lambda: not self.is_running or self.latest(after) is not None, timeout)
+        return self.latest(after)
+        
     def get_frame(self):
-        if self.camera is None or not self.is_running:
+        """The newest frame's image, or None if there isn't a new one yet."""
+        if not self.is_running:
             return None
-            
-        try:
-            ret, frame = self.camera.read()
-            if ret:
-                return frame
-            self.last_error = "Failed to read frame"
-        except Exception as e:
-            self.last_error = str(e)
-            self.is_running = False
-        return None
+        frame = self.latest(self._taken)
+        return frame.image if frame is not None else None
         
     def get_error(self):
         return self.last_error
@@ -0,0 +1,151 @@
+"""
+Photo Editor CLI - Headless batch processing without Qt
+Copyright (c) 2024 D-speedster (github.com/D-speedster)
+"""
+import argparse
+import glob
+import json
+import os
+import signal
+import sys
+import threading
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.webp')
+
+
+def _glob_root(pattern):
+    """The leading folders of `pattern` before the first wildcard."""
+    parts = []
+    for part in os.path.normpath(pattern).split(os.sep)[:-1]:
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    return os.sep.join(parts) or None
+
+
+def collect_inputs(patterns, recursive=False):
+    """Expand files, folders and glob patterns into (path, root) pairs,
+    where root is the folder the output layout is relative to."""
+    found = []
+    seen = set()
+
+    def add(path, root):
+        key = os.path.abspath(path)
+        if key not in seen and path.lower().endswith(IMAGE_EXTENSIONS):
+            seen.add(key)
+            found.append((path, root))
+
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            if recursive:
+                for folder, dirs, files in os.walk(pattern):
+                    dirs.sort()
+                    for name in sorted(files):
+                        add(os.path.join(folder, name), pattern)
+            else:
+                for name in sorted(os.listdir(pattern)):
+                    path = os.path.join(pattern, name)
+                    if os.path.isfile(path):
+                        add(path, pattern)
+        elif glob.has_magic(pattern):
+            root = _glob_root(pattern)
+            for path in sorted(glob.glob(pattern, recursive=recursive)):
+                if os.path.isfile(path):
+                    add(path, root)
+        elif os.path.isfile(pattern):
+            add(pattern, None)
+    return found
+
+
+def _param(text):
+    name, sep, value = text.partition('=')
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expected NAME=VALUE, got {text!r}")
+    try:
+        value = json.loads(value)
+    except ValueError:
+        pass
+    return name, value
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='photo-editor', description="Photo Editor command line")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    batch = commands.add_parser('batch', help="process many images with a filter or recipe")
+    batch.add_argument('inputs', nargs='+', help="image files, folders or glob patterns")
+    batch.add_argument('-o', '--output', required=True, help="output folder")
+    what = batch.add_mutually_exclusive_group(required=True)
+    what.add_argument('-r', '--recipe', help="JSON or YAML recipe file")
+    what.add_argument('-f', '--filter', help="single filter name")
+    batch.add_argument('-p', '--param', action='append', type=_param, default=[],
+                       metavar='NAME=VALUE', help="filter parameter (repeatable)")
+    batch.add_argument('-t', '--template',
+                       help="output file name, with {name} {ext} {suffix} {dir} "
+                            "(default {name}{suffix}.{ext}, under {dir}/ for "
+                            "folder and pattern inputs)")
+    batch.add_argument('-R', '--recursive', action='store_true',
+                       help="descend into folders (and ** in patterns)")
+    batch.add_argument('-j', '--jobs', type=int, default=None,
+                       help="worker processes (default: CPU count)")
+    batch.add_argument('--force', action='store_true',
+                       help="reprocess files even if their outputs are up to date")
+    batch.add_argument('--no-manifest', action='store_true',
+                       help="neither read nor write the output folder's manifest")
+    batch.add_argument('-q', '--quiet', action='store_true', help="no progress output")
+    return parser
+
+
+def run_batch(args):
+    # imported here so `--help` and argument errors stay instant
+    from core.batch import BatchEngine
+    from core.manifest import Manifest
+    from core.recipe import Recipe
+
+    if args.recipe:
+        recipe = Recipe.load(args.recipe)
+    else:
+        recipe = Recipe.from_filter(args.filter, dict(args.param))
+    files = collect_inputs(args.inputs, args.recursive)
+    if not files:
+        print("No input images found", file=sys.stderr)
+        return 2
+
+    manifest = None if args.no_manifest else Manifest.for_output(args.output, args.force)
+    stop = threading.Event()
+    previous = signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    def progress(report):
+        if not args.quiet:
+            print(f"\r[{report.done}/{report.total}] {report.images_per_second:.1f} images/s",
+                  end='', file=sys.stderr, flush=True)
+
+    try:
+        report = BatchEngine(args.jobs).run(files, args.output, recipe, progress=progress,
+                                            cancel=stop.is_set, template=args.template,
+                                            manifest=manifest)
+    finally:
+        signal.signal(signal.SIGINT, previous)
+    if not args.quiet:
+        print(file=sys.stderr)
+    for result in report.failed:
+        print(f"{result.src}: {result.error}", file=sys.stderr)
+    print(report.summary())
+    if report.cancelled:
+        return 130
+    return 1 if report.failed else 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        if args.command == 'batch':
+            return run_batch(args)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,55 @@
+"""
+Adjustment Stack - Fused brightness/contrast/saturation rendering
+Copyright (c) 2024 D-speedster (github.com/D-speedster)
+"""
+import cv2
+
+from core.adjustments import build_lut, build_hsv_lut
+
+
+class AdjustmentStack:
+    TYPES = ('brightness', 'contrast', 'saturation')
+
+    def __init__(self, **values):
+        self.values = dict.fromkeys(self.TYPES, 0)
+        for adj_type, value in values.items():
+            self.set(adj_type, value)
+
+    def set(self, adj_type, value):
+        if adj_type not in self.values:
+            raise ValueError(f"Unknown adjustment: {adj_type}")
+        self.values[adj_type] = value
+
+    def get(self, adj_type):
+        return self.values.get(adj_type, 0)
+
+    def reset(self):
+        for adj_type in self.TYPES:
+            self.values[adj_type] = 0
+
+    def is_identity(self):
+        return not any(self.values.values())
+
+    def apply(self, image):
+        """Render every slider from `image` in one pass.
+
+        Brightness and saturation share one HSV round trip with a single
+        3-channel LUT, contrast is a BGR LUT applied in place afterwards.
+        """
+        if image is None:
+            return None
+
+        b = self.values['brightness']
+        c = self.values['contrast']
+        s = self.values['saturation']
+
+        if b or s:
+            out = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+            cv2.LUT(out, build_hsv_lut(s, b), dst=out)
+            cv2.cvtColor(out, cv2.COLOR_HSV2BGR, dst=out)
+            if c:
+                cv2.LUT(out, build_lut('contrast', c), dst=out)
+            return out
+        if c:
+            return cv2.LUT(image, build_lut('contrast', c))
+        return image.copy()
@@ -2,23 +2,55 @@
 Image Adjustments - Brightness, Contrast, Saturation
 Copyright (c) 2024 D-speedster (github.com/D-speedster)
 """
+from functools import lru_cache
+
 import cv2
 import numpy as np
 
 
+LUT_CACHE_SIZE = 256
+
+_IDENTITY = np.arange(256, dtype=np.uint8)
+
+
+@lru_cache(maxsize=LUT_CACHE_SIZE)
+def build_lut(adj_type, value):
+    """Compile one (type, value) pair into a read-only 256-entry uint8 table"""
+    x = np.arange(256, dtype=np.float32)
+    if adj_type in ('brightness', 'saturation'):
+        table = np.clip(x + value, 0, 255)
+    elif adj_type == 'contrast':
+        value = np.clip(value, -255, 254)
+        factor = (259 * (value + 255)) / (255 * (259 - value))
+        table = np.clip(factor * (x - 128) + 128, 0, 255)
+    else:
+        raise ValueError(f"Unknown adjustment: {adj_type}")
+    table = table.astype(np.uint8)
+    table.flags.writeable = False
+    return table
+
+
+@lru_cache(maxsize=LUT_CACHE_SIZE)
+def build_hsv_lut(s_value, v_value):
+    """3-channel table for HSV images: H untouched, S and V shifted"""
+    s = build_lut('saturation', s_value) if s_value else _IDENTITY
+    v = build_lut('brightness', v_value) if v_value else _IDENTITY
+    table = np.dstack([_IDENTITY, s, v]).reshape(1, 256, 3)
+    table.flags.writeable = False
+    return table
+
+
 class Adjustments:
     def brightness(self, image, value):
-        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV).astype(np.float32)
-        hsv[:, :, 2] = np.clip(hsv[:, :, 2] + value, 0, 255)
-        return cv2.cvtColor(hsv.astype(np.uint8), cv2.COLOR_HSV2BGR)
-        
+        return self._apply_hsv(image, 0, value)
+
     def contrast(self, image, value):
-        value = np.clip(value, -255, 254)
-        factor = (259 * (value + 255)) / (255 * (259 - value))
-        result = factor * (image.astype(np.float32) - 128) + 128
-        return np.clip(result, 0, 255).astype(np.uint8)
-        
+        return cv2.LUT(image, build_lut('contrast', value))
+
     def saturation(self, image, value):
-        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV).astype(np.float32)
-        hsv[:, :, 1] = np.clip(hsv[:, :, 1] + value, 0, 255)
-        return cv2.cvtColor(hsv.astype(np.uint8), cv2.COLOR_HSV2BGR)
+        return self._apply_hsv(image, value, 0)
+
+    def _apply_hsv(self, image, s_value, v_value):
+        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        cv2.LUT(hsv, build_hsv_lut(s_value, v_value), dst=hsv)
+        return cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR, dst=hsv)
@@ -0,0 +1,371 @@
+"""
+Batch Engine - Pipelined, parallel batch processing
+Copyright (c) 2024 D-speedster (github.com/D-speedster)
+"""
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+import cv2
+import numpy as np
+
+from core.image_processor import ImageProcessor
+from core.manifest import Manifest, file_digest
+from core.recipe import Recipe
+
+
+_processor = None
+_compiled = {}
+
+
+def _init_worker():
+    global _processor
+    # Ctrl+C is handled by the parent, which finishes the files in flight
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # the pool already keeps every core busy
+    cv2.setNumThreads(1)
+    _processor = ImageProcessor()
+
+
+def _get_processor():
+    global _processor
+    if _processor is None:
+        _processor = ImageProcessor()
+    return _processor
+
+
+def _compile(recipe):
+    key = recipe.key
+    chain = _compiled.get(key)
+    if chain is None:
+        chain = _compiled[key] = recipe.compile(_get_processor())
+    return chain
+
+
+def _decode(data, src):
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"Cannot read image: {src}")
+    return image
+
+
+def _encode(image, dst, params=None):
+    ok, buf = cv2.imencode(os.path.splitext(dst)[1] or ".png", image, params or [])
+    if not ok:
+        raise ValueError(f"Cannot write image: {dst}")
+    return buf.tobytes()
+
+
+def process_bytes(data, src, dst, recipe):
+    """Decode, run `recipe` on and re-encode one file's contents in a single
+    pass; runs in the pool."""
+    image = _decode(data, src)
+    result = _compile(recipe).apply(image)
+    return _encode(result, dst, recipe.encode_params(dst))
+
+
+def process_file(src, dst, recipe):
+    with open(src, "rb") as f:
+        data = f.read()
+    data = process_bytes(data, src, dst, recipe)
+    with open(dst, "wb") as f:
+        f.write(data)
+
+
+class FileResult:
+    def __init__(self, index, src, dst, error=None, seconds=0.0, skipped=False):
+        self.index = index
+        self.src = src
+        self.dst = dst
+        self.error = error
+        self.seconds = seconds
+        self.skipped = skipped
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        state = self.error or ("skipped" if self.skipped else "ok")
+        return f"FileResult({self.src!r}, {state})"
+
+
+def _describe(error):
+    return f"{type(error).__name__}: {error}"
+
+
+class BatchReport:
+    def __init__(self, total):
+        self.total = total
+        self.results = []
+        self.cancelled = False
+        self._start = time.perf_counter()
+        self._end = None
+
+    def add(self, result):
+        self.results.append(result)
+
+    def finish(self, cancelled=False):
+        self.cancelled = cancelled
+        self._end = time.perf_counter()
+
+    @property
+    def done(self):
+        return len(self.results)
+
+    @property
+    def failed(self):
+        return [r for r in self.results if not r.ok]
+
+    @property
+    def skipped(self):
+        return sum(1 for r in self.results if r.skipped)
+
+    @property
+    def succeeded(self):
+        return self.done - len(self.failed)
+
+    @property
+    def elapsed(self):
+        return (self._end or time.perf_counter()) - self._start
+
+    @property
+    def images_per_second(self):
+        elapsed = self.elapsed
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def percent(self):
+        return int(self.done / self.total * 100) if self.total else 100
+
+    def summary(self):
+        text = (f"{self.succeeded}/{self.total} images in {self.elapsed:.1f}s "
+                f"({self.images_per_second:.1f} images/s)")
+        if self.skipped:
+            text += f", {self.skipped} up to date"
+        if self.failed:
+            text += f", {len(self.failed)} failed"
+        if self.cancelled:
+            text += ", cancelled"
+        return text
+
+
+_DONE = object()
+
+
+class BatchEngine:
+    """Runs one Recipe over many files as a three stage pipeline.
+
+    `readers` threads load raw file bytes, a pool of `workers` processes
+    decodes, processes and re-encodes them, and `writers` threads put the
+    bytes on disk, so disk and CPU work overlap. Only compressed bytes
+    cross process boundaries, and every worker process builds its own
+    ImageProcessor once. The queues between the stages are bounded, so
+    memory stays flat however many files there are.
+
+    Results are reported in input order, and a file that fails is recorded
+    in the report instead of stopping the batch. With a Manifest, the
+    readers skip files whose outputs are up to date and the writers record
+    every file they finish. `workers=1` processes in
+    the calling process on a single thread.
+    """
+
+    def __init__(self, workers=None, readers=2, writers=2):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.readers = max(1, readers)
+        self.writers = max(1, writers)
+
+    def run(self, files, output_dir, recipe, progress=None, cancel=None, template=None,
+            manifest=None):
+        """`files` are paths or (path, root) pairs, where root is the folder
+        that {dir} in the output `template` is relative to.
+
+        `recipe` is a Recipe or a filter name. `progress(report)` is
+        called after every file; `cancel()` is polled while running and
+        stops reading new files once it returns True (files already read
+        are still finished). Files that would be written to the same output
+        path, or onto an input, are reported as failed and not processed."""
+        if isinstance(recipe, str):
+            recipe = Recipe.from_filter(recipe)
+        jobs = [(i,) + self._job(item, output_dir, recipe, template)
+                for i, item in enumerate(files)]
+        rejected = self._clashes(jobs)
+        report = BatchReport(len(files))
+        try:
+            for result in self._pipeline(iter(jobs), recipe, cancel or (lambda: False),
+                                         manifest, rejected):
+                report.add(result)
+                if progress is not None:
+                    progress(report)
+        finally:
+            if manifest is not None:
+                manifest.close()
+        report.finish(cancelled=report.done < report.total)
+        return report
+
+    @staticmethod
+    def _job(item, output_dir, recipe, template):
+        src, root = (item, None) if isinstance(item, str) else item
+        return src, recipe.output_path(src, output_dir, template, root)
+
+    @staticmethod
+    def _clashes(jobs):
+        """Errors for jobs whose output another job would also write, or
+        that would overwrite an input; none of them are run."""
+        def norm(path):
+            return os.path.normcase(os.path.abspath(path))
+
+        by_dst = {}
+        for index, src, dst in jobs:
+            by_dst.setdefault(norm(dst), []).append((index, src))
+        rejected = {}
+        for group in by_dst.values():
+            if len(group) > 1:
+                for index, src in group:
+                    others = ', '.join(other for i, other in group if i != index)
+                    rejected[index] = f"Output name clashes with {others}"
+        for index, src, dst in jobs:
+            for i, _ in by_dst.get(norm(src), ()):
+                rejected[i] = f"Output would overwrite input {src}"
+        return rejected
+
+    def _executor(self):
+        if self.workers == 1:
+            return ThreadPoolExecutor(max_workers=1, thread_name_prefix="pe_batch")
+        # spawn: forking a process that runs Qt and pool threads is unsafe
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                   mp_context=multiprocessing.get_context("spawn"))
+
+    def _pipeline(self, jobs, recipe, cancel, manifest=None, rejected=None):
+        depth = self.workers * 2
+        read_q = queue.Queue(depth)
+        write_q = queue.Queue()
+        done_q = queue.Queue()
+        # files between the pool and the end of their write
+        slots = threading.Semaphore(depth + self.writers)
+        stop = threading.Event()
+        fed = threading.Event()
+        job_lock = threading.Lock()
+        entered = [0]
+        recipe_hash = recipe.digest
+        pool = self._executor()
+
+        def skip(job, stat, digest=None):
+            if manifest is None or not manifest.is_current(job[1], job[2], recipe_hash, stat, digest):
+                return False
+            if digest is not None:
+                # touched but unchanged: remember the new mtime
+                manifest.record(job[1], job[2], recipe_hash, stat, digest)
+            done_q.put(FileResult(*job, skipped=True))
+            return True
+
+        def read():
+            while True:
+                with job_lock:
+                    job = None if stop.is_set() else next(jobs, None)
+                    if job is None:
+                        break
+                    entered[0] += 1
+                data, error, stamp = None, None, None
+                if rejected and job[0] in rejected:
+                    read_q.put((job, None, rejected[job[0]], None))
+                    continue
+                try:
+                    stat = Manifest.stat(job[1]) if manifest is not None else None
+                    if skip(job, stat):
+                        continue
+                    with open(job[1], "rb") as f:
+                        data = f.read()
+                    if manifest is not None:
+                        stamp = (stat, file_digest(data))
+                        if skip(job, *stamp):
+                            continue
+                except OSError as e:
+                    error = _describe(e)
+                read_q.put((job, data, error, stamp))
+            read_q.put(_DONE)
+
+        def processed(job, start, stamp, future):
+            data, error = None, None
+            try:
+                data = future.result()
+            except Exception as e:
+                error = _describe(e)
+            write_q.put((job, data, error, time.perf_counter() - start, stamp))
+
+        def feed():
+            readers_left = self.readers
+            while readers_left:
+                item = read_q.get()
+                if item is _DONE:
+                    readers_left -= 1
+                    continue
+                job, data, error, stamp = item
+                slots.acquire()
+                if error is not None:
+                    write_q.put((job, None, error, 0.0, None))
+                    continue
+                start = time.perf_counter()
+                try:
+                    future = pool.submit(process_bytes, data, job[1], job[2], recipe)
+                except Exception as e:
+                    write_q.put((job, None, _describe(e), 0.0, None))
+                    continue
+                future.add_done_callback(partial(processed, job, start, stamp))
+            fed.set()
+
+        def write():
+            while True:
+                item = write_q.get()
+                if item is _DONE:
+                    break
+                (index, src, dst), data, error, seconds, stamp = item
+                if error is None:
+                    try:
+                        os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+                        with open(dst, "wb") as f:
+                            f.write(data)
+                        if stamp is not None:
+                            manifest.record(src, dst, recipe_hash, *stamp)
+                    except OSError as e:
+                        error = _describe(e)
+                slots.release()
+                done_q.put(FileResult(index, src, dst, error, seconds))
+
+        threads = [threading.Thread(target=read, name=f"pe_batch_read{i}", daemon=True)
+                   for i in range(self.readers)]
+        feeder = threading.Thread(target=feed, name="pe_batch_feed", daemon=True)
+        writers = [threading.Thread(target=write, name=f"pe_batch_write{i}", daemon=True)
+                   for i in range(self.writers)]
+        for t in threads + [feeder] + writers:
+            t.start()
+        try:
+            finished = {}
+            received = 0
+            next_index = 0
+            while not (fed.is_set() and received == entered[0]):
+                if cancel():
+                    stop.set()
+                try:
+                    result = done_q.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                received += 1
+                finished[result.index] = result
+                # hold back results until everything before them is done
+                while next_index in finished:
+                    yield finished.pop(next_index)
+                    next_index += 1
+        finally:
+            stop.set()
+            feeder.join()
+            pool.shutdown(wait=True)
+            for _ in writers:
+                write_q.put(_DONE)
+            for t in threads + writers:
+                t.join()
@@ -0,0 +1,254 @@
+"""
+Edit Graph - Non-destructive, lazily rendered document history
+Copyright (c) 2024 D-speedster (github.com/D-speedster)
+"""
+from collections import OrderedDict
+from itertools import count
+
+
+DEFAULT_CACHE_BUDGET = 512 * 1024 * 1024
+DEFAULT_HISTORY_BUDGET = 1024 * 1024 * 1024
+
+
+class EditNode:
+    """One step of the document: either a stored raster (`key`) or an
+    ImageProcessor method name plus the keyword arguments to call it with.
+
+    An operation applies to the previous node's image, or to `source`'s
+    when set (an earlier node it replaces rather than builds on)."""
+
+    def __init__(self, op=None, params=None, key=None, source=None):
+        self.op = op
+        self.params = dict(params or {})
+        self.key = key
+        self.source = source
+
+    @property
+    def is_raster(self):
+        return self.key is not None
+
+    def apply(self, processor, image):
+        return getattr(processor, self.op)(image, **self.params)
+
+    def __repr__(self):
+        if self.is_raster:
+            return "EditNode(raster)"
+        return f"EditNode({self.op!r}, {self.params!r})"
+
+
+class MemoryStore:
+    """Default raster store; keeps snapshots as plain arrays"""
+
+    def __init__(self):
+        self._items = {}
+        self._ids = count()
+        self.stored_bytes = 0
+
+    def put(self, image):
+        key = next(self._ids)
+        self._items[key] = image.copy()
+        self.stored_bytes += image.nbytes
+        return key
+
+    def get(self, key):
+        return self._items.get(key)
+
+    def remove(self, keys):
+        for key in keys:
+            image = self._items.pop(key, None)
+            if image is not None:
+                self.stored_bytes -= image.nbytes
+
+
+class EditGraph:
+    """Linear chain of edits rendered on demand.
+
+    Only raster nodes (the opened image, brush strokes, dialog results)
+    hold pixels in `store`; every other node is an operation replayed from
+    the nearest cached ancestor. Rendered results go into an LRU cache
+    bounded by `cache_budget` bytes, so undo/redo is a pointer move that
+    usually hits the cache, and changing a node's parameters only
+    re-renders the nodes after it.
+
+    Undo depth is bounded by what the rasters cost: once the store holds
+    more than `history_budget` bytes (its `stored_bytes`, compressed and
+    tile-shared for a SnapshotStore), the oldest edits are flattened into a
+    new raster source. `max_steps` only caps how long a chain of cheap
+    operation nodes may grow.
+    """
+
+    def __init__(self, processor, store=None, cache_budget=DEFAULT_CACHE_BUDGET,
+                 history_budget=DEFAULT_HISTORY_BUDGET, max_steps=500):
+        self.processor = processor
+        self.store = store if store is not None else MemoryStore()
+        self.cache_budget = cache_budget
+        self.history_budget = history_budget
+        self.max_steps = max_steps
+        self.nodes = []
+        self.index = -1
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+
+    def __len__(self):
+        return len(self.nodes)
+
+    @property
+    def head(self):
+        return self.nodes[self.index] if self.index >= 0 else None
+
+    def can_undo(self):
+        return self.index > 0
+
+    def can_redo(self):
+        return self.index < len(self.nodes) - 1
+
+    def reset(self, image):
+        self.clear()
+        return self.push_raster(image)
+
+    def clear(self):
+        self.store.remove([n.key for n in self.nodes if n.is_raster])
+        self.nodes = []
+        self.index = -1
+        self._cache.clear()
+        self._cache_bytes = 0
+
+    def push(self, op, params=None, result=None, source=None):
+        """Append an operation node. `result`, if the caller already has it,
+        seeds the cache so nothing is recomputed. With `source` (an earlier
+        node) the operation renders from that node's image instead of the
+        previous one's."""
+        if source is not None and source is self.head:
+            source = None
+        return self._append(EditNode(op, params, source=source), result)
+
+    def push_raster(self, image):
+        node = EditNode(key=self.store.put(image))
+        return self._append(node, image)
+
+    def set_params(self, node, params, result=None):
+        """Change the parameters of an existing operation node and drop every
+        cached result that depended on it."""
+        i = self._index_of(node)
+        node = self.nodes[i]
+        if node.is_raster:
+            raise ValueError("Raster nodes have no parameters")
+        node.params = dict(params or {})
+        for later in self.nodes[i:]:
+            if later is not node and later.is_raster:
+                break
+            self._forget(later)
+        if result is not None:
+            self._remember(node, result)
+        return node
+
+    def render(self, index=None):
+        """Return the image at `index` (default: the current position), or
+        None if a snapshot it depends on can't be read back."""
+        if self.index < 0:
+            return None
+        i = self.index if index is None else self._index_of(index)
+
+        pending = []
+        image = None
+        while i >= 0:
+            node = self.nodes[i]
+            image = self._cache.get(node)
+            if image is not None:
+                self._cache.move_to_end(node)
+                break
+            if node.is_raster:
+                # a snapshot that can't be read back fails the render; an
+                # ancestor's pixels would silently stand in for it
+                image = self.store.get(node.key)
+                if image is None:
+                    return None
+                self._remember(node, image)
+                break
+            pending.append(node)
+            i = self._index_of(node.source) if node.source is not None else i - 1
+        if image is None:
+            return None
+
+        for node in reversed(pending):
+            image = node.apply(self.processor, image)
+            self._remember(node, image)
+        return image
+
+    def undo(self):
+        """Step back and return the image; the step is refused (None) if
+        that image can't be rendered."""
+        if not self.can_undo():
+            return None
+        self.index -= 1
+        image = self.render()
+        if image is None:
+            self.index += 1
+        return image
+
+    def redo(self):
+        if not self.can_redo():
+            return None
+        self.index += 1
+        image = self.render()
+        if image is None:
+            self.index -= 1
+        return image
+
+    def _index_of(self, node):
+        if isinstance(node, int):
+            return node if node >= 0 else len(self.nodes) + node
+        return self.nodes.index(node)
+
+    def _append(self, node, result):
+        dropped = self.nodes[self.index + 1:]
+        self.store.remove([n.key for n in dropped if n.is_raster])
+        for n in dropped:
+            self._forget(n)
+        self.nodes = self.nodes[:self.index + 1]
+
+        self.nodes.append(node)
+        self.index += 1
+        if result is not None:
+            self._remember(node, result)
+        self._flatten()
+        return node
+
+    def _over_budget(self):
+        if len(self.nodes) > self.max_steps + 1:
+            return True
+        stored = getattr(self.store, 'stored_bytes', 0)
+        return self.history_budget is not None and stored > self.history_budget
+
+    def _flatten(self):
+        while len(self.nodes) > 1 and self._over_budget():
+            # whatever renders from the oldest node becomes a raster itself
+            first = self.nodes[0]
+            targets = [(nxt, self.render(i)) for i, nxt in enumerate(self.nodes[1:], 1)
+                       if i == 1 and not nxt.is_raster or nxt.source is first]
+            if any(image is None for _, image in targets):
+                break
+            for nxt, image in targets:
+                nxt.key = self.store.put(image)
+                nxt.op = None
+                nxt.params = {}
+                nxt.source = None
+            old = self.nodes.pop(0)
+            if old.is_raster:
+                self.store.remove([old.key])
+            self._forget(old)
+            self.index -= 1
+
+    def _remember(self, node, image):
+        self._forget(node)
+        self._cache[node] = image
+        self._cache_bytes += image.nbytes
+        # the newest entry always stays, even if it alone is over budget
+        while self._cache_bytes > self.cache_budget and len(self._cache) > 1:
+            _, old = self._cache.popitem(last=False)
+            self._cache_bytes -= old.nbytes
+
+    def _forget(self, node):
+        image = self._cache.pop(node, None)
+        if image is not None:
+            self._cache_bytes -= image.nbytes
@@ -2,6 +2,9 @@
 Face Detection - Face, eyes and smile detection using Haar Cascades
 Copyright (c) 2024 D-speedster (github.com/D-speedster)
 """
+import hashlib
+from collections import OrderedDict
+
 import cv2
 import numpy as np
 import os
@@ -36,6 +39,7 @@ class FaceDetector:
         self.left_eye = self._load_cascade(cv2_path, 'haarcascade_lefteye_2splits.xml')
         self.right_eye = self._load_cascade(cv2_path, 'haarcascade_righteye_2splits.xml')
         self.smile_cascade = self._load_cascade(cv2_path, 'haarcascade_smile.xml')
+        self._detections = OrderedDict()
         
     def _load_cascade(self, path, filename):
         """Load cascade with error handling"""
@@ -230,51 +234,52 @@ class FaceDetector:
             
         return boxes[keep].tolist()
         
-    def blur_faces_advanced(self, image, min_size=50, accuracy=6):
-        """محو کردن چهره‌ها"""
+    def find_faces(self, image, min_size=50, accuracy=6):
+        """مستطیل چهره‌ها (x, y, w, h)"""
         gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         gray = cv2.equalizeHist(gray)
-        result = image.copy()
-        
         faces = self.face_cascade.detectMultiScale(
             gray, scaleFactor=1.1, minNeighbors=accuracy, minSize=(min_size, min_size)
         )
-        
+        return [tuple(int(v) for v in f) for f in faces]
+        
+    def detect(self, image, min_size=50, accuracy=6):
+        """مستطیل چهره‌ها، با کش بر اساس محتوای تصویر"""
+        # keyed by pixels, so one detection serves every effect and the count
+        data = np.ascontiguousarray(image)
+        key = (data.shape, data.dtype.str, hashlib.blake2b(data, digest_size=16).digest(),
+               min_size, accuracy)
+        faces = self._detections.get(key)
+        if faces is None:
+            faces = tuple(self.find_faces(image, min_size, accuracy))
+            self._detections[key] = faces
+            while len(self._detections) > 8:
+                self._detections.popitem(last=False)
+        else:
+            self._detections.move_to_end(key)
+        return faces
+        
+    def blur_regions(self, image, faces):
+        result = image.copy()
         for (x, y, w, h) in faces:
             roi = result[y:y+h, x:x+w]
             blurred = cv2.GaussianBlur(roi, (99, 99), 30)
             result[y:y+h, x:x+w] = blurred
-            
         return result
         
-    def pixelate_faces_advanced(self, image, pixel_size=15, min_size=50, accuracy=6):
-        """پیکسلی کردن چهره‌ها"""
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        gray = cv2.equalizeHist(gray)
+    def pixelate_regions(self, image, faces, pixel_size=15):
         result = image.copy()
-        
-        faces = self.face_cascade.detectMultiScale(
-            gray, scaleFactor=1.1, minNeighbors=accuracy, minSize=(min_size, min_size)
-        )
-        
         for (x, y, w, h) in faces:
             roi = result[y:y+h, x:x+w]
+            if roi.size == 0:
+                continue
             small = cv2.resize(roi, (pixel_size, pixel_size), interpolation=cv2.INTER_LINEAR)
-            pixelated = cv2.resize(small, (w, h), interpolation=cv2.INTER_NEAREST)
+            pixelated = cv2.resize(small, (roi.shape[1], roi.shape[0]), interpolation=cv2.INTER_NEAREST)
             result[y:y+h, x:x+w] = pixelated
-            
         return result
         
-    def add_emoji_advanced(self, image, emoji_type='sunglasses', min_size=50, accuracy=6):
-        """اضافه کردن ایموجی"""
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        gray = cv2.equalizeHist(gray)
+    def draw_emoji(self, image, faces, emoji_type='sunglasses'):
         result = image.copy()
-        
-        faces = self.face_cascade.detectMultiScale(
-            gray, scaleFactor=1.1, minNeighbors=accuracy, minSize=(min_size, min_size)
-        )
-        
         for (x, y, w, h) in faces:
             if emoji_type == 'sunglasses':
                 # رسم عینک ساده
@@ -293,16 +298,117 @@ class FaceDetector:
                 ], np.int32)
                 cv2.fillPoly(result, [pts], (200, 200, 200))
                 cv2.polylines(result, [pts], True, (150, 150, 150), 2)
-                
         return result
         
+    def draw_detections(self, image, data):
+        """رسم نتیجه detect_faces_advanced روی تصویر"""
+        result = image.copy()
+        for face in data:
+            x, y, w, h = face['rect']
+            cv2.rectangle(result, (x, y), (x+w, y+h), (0, 255, 0), 2)
+            for (ex, ey, ew, eh) in face['eyes']:
+                cv2.rectangle(result, (ex, ey), (ex+ew, ey+eh), (255, 0, 0), 2)
+            for (sx, sy, sw, sh) in face['smiles']:
+                cv2.rectangle(result, (sx, sy), (sx+sw, sy+sh), (0, 0, 255), 2)
+        return result
+        
+    def blur_faces_advanced(self, image, min_size=50, accuracy=6):
+        """محو کردن چهره‌ها"""
+        return self.blur_regions(image, self.detect(image, min_size, accuracy))
+        
+    def pixelate_faces_advanced(self, image, pixel_size=15, min_size=50, accuracy=6):
+        """پیکسلی کردن چهره‌ها"""
+        return self.pixelate_regions(image, self.detect(image, min_size, accuracy), pixel_size)
+        
+    def add_emoji_advanced(self, image, emoji_type='sunglasses', min_size=50, accuracy=6):
+        """اضافه کردن ایموجی"""
+        return self.draw_emoji(image, self.detect(image, min_size, accuracy), emoji_type)
+        
     def count_faces_advanced(self, image, min_size=50, accuracy=6):
         """شمارش چهره‌ها"""
+        return len(self.detect(image, min_size, accuracy))
+
+
+class FaceTracker:
+    """ردیابی چهره بین فریم‌های ویدیو"""
+    # full detection every `detect_every` frames or when a track is lost;
+    # optical flow moves the boxes in between
+
+    def __init__(self, detector, detect_every=10, min_size=50, accuracy=6, min_points=5):
+        self.detector = detector
+        self.detect_every = detect_every
+        self.min_size = min_size
+        self.accuracy = accuracy
+        self.min_points = min_points
+        self.detections = 0
+        self.frames = 0
+        self._prev = None
+        self._tracks = []        # [rect, points] per face
+        self._since_detect = 0
+        
+    def reset(self):
+        self._prev = None
+        self._tracks = []
+        
+    def update(self, image):
+        """مستطیل چهره‌ها در این فریم"""
         gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        gray = cv2.equalizeHist(gray)
-        
-        faces = self.face_cascade.detectMultiScale(
-            gray, scaleFactor=1.1, minNeighbors=accuracy, minSize=(min_size, min_size)
-        )
-        
-        return len(faces)
+        self.frames += 1
+        tracked = self._track(gray) if self._prev is not None else None
+        if tracked is None or self._since_detect >= self.detect_every:
+            tracked = self._detect(image, gray)
+        else:
+            self._since_detect += 1
+        self._tracks = tracked
+        self._prev = gray
+        return [rect for rect, _ in tracked]
+        
+    def _detect(self, image, gray):
+        self.detections += 1
+        self._since_detect = 1
+        tracks = []
+        for rect in self.detector.find_faces(image, self.min_size, self.accuracy):
+            tracks.append([rect, self._features(gray, rect)])
+        return tracks
+        
+    def _features(self, gray, rect):
+        x, y, w, h = rect
+        # مرکز صورت؛ لبه‌ها معمولاً پس‌زمینه‌اند
+        mask = np.zeros_like(gray)
+        mask[y + h // 6:y + h - h // 6, x + w // 6:x + w - w // 6] = 255
+        points = cv2.goodFeaturesToTrack(gray, 40, 0.01, 5, mask=mask)
+        return points if points is not None else np.empty((0, 1, 2), np.float32)
+        
+    def _track(self, gray):
+        """ردیابی با جریان نوری؛ None یعنی چهره گم شد"""
+        if not self._tracks:
+            # no faces: look again only on the regular schedule
+            return []
+        tracks = []
+        h_img, w_img = gray.shape[:2]
+        for rect, points in self._tracks:
+            if len(points) < self.min_points:
+                return None
+            moved, status, _ = cv2.calcOpticalFlowPyrLK(
+                self._prev, gray, points, None, winSize=(21, 21), maxLevel=3)
+            ok = status.ravel() == 1
+            if ok.sum() < self.min_points:
+                return None
+            old, new = points[ok].reshape(-1, 2), moved[ok].reshape(-1, 2)
+            dx, dy = np.median(new - old, axis=0)
+            # scale from how the spread of the points around their centre changed
+            spread_old = np.linalg.norm(old - old.mean(axis=0), axis=1)
+            spread_new = np.linalg.norm(new - new.mean(axis=0), axis=1)
+            valid = spread_old > 1e-3
+            scale = float(np.median(spread_new[valid] / spread_old[valid])) if valid.any() else 1.0
+            x, y, w, h = rect
+            cx, cy = x + w / 2 + dx, y + h / 2 + dy
+            w, h = w * scale, h * scale
+            x, y = int(round(cx - w / 2)), int(round(cy - h / 2))
+            w, h = int(round(w)), int(round(h))
+            x, y = max(0, x), max(0, y)
+            w, h = min(w, w_img - x), min(h, h_img - y)
+            if w < self.min_size // 2 or h < self.min_size // 2:
+                return None
+            tracks.append([(x, y, w, h), new.reshape(-1, 1, 2)])
+        return tracks
@@ -0,0 +1,77 @@
+"""
+Filter Registry - Declarative filter table with scheduling metadata
+Copyright (c) 2024 D-speedster (github.com/D-speedster)
+"""
+from functools import partial
+
+
+# how a filter may be split across tiles
+TILE_NONE = None          # needs the whole image (global thresholds, feature search)
+TILE_STRIP = 'strip'      # output rows depend only on input rows within `halo`
+TILE_STAGED = 'staged'    # takes a `tiler` argument and tiles its own local stage
+
+
+def _kernel_radius(default):
+    def radius(params):
+        k = params.get('kernel_size', default)
+        k = k if k % 2 == 1 else k + 1
+        return k // 2
+    return radius
+
+
+class FilterSpec:
+    def __init__(self, name, method, args=None, pointwise=False, halo=0, tiling=TILE_STRIP):
+        self.name = name
+        self.method = method
+        self.args = args or {}
+        self.pointwise = pointwise
+        self.halo = halo
+        self.tiling = tiling
+
+    def halo_for(self, params):
+        return self.halo(params) if callable(self.halo) else self.halo
+
+    def bind(self, filters):
+        method = getattr(filters, self.method)
+        return partial(method, **self.args) if self.args else method
+
+    def __repr__(self):
+        return f"FilterSpec({self.name!r}, pointwise={self.pointwise}, tiling={self.tiling!r})"
+
+
+FILTERS = {}
+
+
+def register(spec):
+    FILTERS[spec.name] = spec
+    return spec
+
+
+def get_spec(name):
+    return FILTERS.get(name)
+
+
+def filter_names():
+    return list(FILTERS)
+
+
+def _point(name, method, args=None):
+    return register(FilterSpec(name, method, args, pointwise=True))
+
+
+register(FilterSpec('blur', 'blur', halo=_kernel_radius(15)))
+register(FilterSpec('sharpen', 'sharpen', halo=1))
+register(FilterSpec('edge', 'edge_detection', tiling=TILE_NONE))
+register(FilterSpec('emboss', 'emboss', halo=1))
+_point('grayscale', 'grayscale')
+_point('sepia', 'sepia')
+_point('invert', 'invert')
+# median(5) feeds a 9x9 adaptive threshold, bilateral uses d=9
+register(FilterSpec('cartoon', 'cartoon', halo=6))
+register(FilterSpec('median', 'median', halo=_kernel_radius(5)))
+for _ch in ('red', 'green', 'blue'):
+    _point(f'remove_{_ch}', 'remove_channel', {'channel': _ch})
+for _ch in ('red', 'green', 'blue'):
+    _point(f'only_{_ch}', 'keep_channel', {'channel': _ch})
+register(FilterSpec('corners', 'corner_detection', tiling=TILE_NONE))
+register(FilterSpec('harris', 'harris_corners', tiling=TILE_STAGED))
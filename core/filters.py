@@ -84,11 +84,17 @@ class Filters:
                 cv2.circle(result, (int(x), int(y)), 5, (0, 255, 0), -1)
         return result
     
-    def harris_corners(self, image, block_size=2, ksize=3, k=0.04):
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        gray = np.float32(gray)
-        dst = cv2.cornerHarris(gray, block_size, ksize, k)
-        dst = cv2.dilate(dst, None)
+    def harris_corners(self, image, block_size=2, ksize=3, k=0.04, tiler=None):
+        gray = np.float32(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY))
+        if tiler is not None:
+            halo = block_size + ksize // 2 + 1
+            dst = tiler.run(lambda g: self.harris_response(g, block_size, ksize, k), gray, halo)
+        else:
+            dst = self.harris_response(gray, block_size, ksize, k)
         result = image.copy()
         result[dst > 0.01 * dst.max()] = [0, 0, 255]
         return result
+    
+    def harris_response(self, gray, block_size=2, ksize=3, k=0.04):
+        dst = cv2.cornerHarris(gray, block_size, ksize, k)
+        return cv2.dilate(dst, None)
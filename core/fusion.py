@@ -0,0 +1,149 @@
+"""
+Chain Fusion - Collapse runs of point-wise operations into single passes
+Copyright (c) 2024 D-speedster (github.com/D-speedster)
+"""
+import cv2
+import numpy as np
+
+from core.adjustments import build_lut
+from core.adjustment_stack import AdjustmentStack
+from core.filter_registry import get_spec
+
+
+_IDENTITY = np.arange(256, dtype=np.uint8)
+_CHANNELS = {'blue': 0, 'green': 1, 'red': 2}
+
+def _channel_lut(tables):
+    return np.stack(tables, axis=1)
+
+
+def point_lut(name, params=None):
+    """Return the 256x3 per-channel table for a channel-separable op, or
+    None if `name` is not one.
+
+    Filters must be registered as pointwise, and only those whose table
+    reproduces their own implementation exactly qualify. Colour mixes like grayscale and sepia round differently from
+    cv2.cvtColor, and brightness/saturation go through HSV, whose BGR
+    round trip loses hue on dark pixels; later steps can magnify either
+    difference, so those always run on their own.
+    """
+    params = params or {}
+    if name == 'contrast':
+        return _channel_lut([build_lut('contrast', params.get('value', 0))] * 3)
+    spec = get_spec(name)
+    if spec is None or not spec.pointwise:
+        return None
+    params = dict(spec.args, **params)
+
+    if spec.method == 'invert':
+        return _channel_lut([255 - _IDENTITY] * 3)
+    if spec.method in ('remove_channel', 'keep_channel'):
+        idx = _CHANNELS.get(params.get('channel', 'red'))
+        keep = spec.method == 'keep_channel'
+        zero = np.zeros(256, dtype=np.uint8)
+        return _channel_lut([_IDENTITY if (c == idx) == keep else zero for c in range(3)])
+    return None
+
+
+class PointStage:
+    def __init__(self, lut, processor):
+        self.lut = lut
+        self.processor = processor
+        self.ops = []
+        self.steps = []
+
+    def absorb(self, lut):
+        self.lut = np.stack([lut[self.lut[:, c], c] for c in range(3)], axis=1)
+
+    def apply(self, image):
+        if len(self.steps) == 1:
+            # nothing fused: the op's own implementation is just as fast
+            return _run_step(self.processor, image, *self.steps[0])
+        return cv2.LUT(image, self.lut.reshape(1, 256, 3))
+
+
+class OpStage:
+    def __init__(self, func, name):
+        self.func = func
+        self.ops = [name]
+
+    def apply(self, image):
+        return self.func(image)
+
+
+class CompiledChain:
+    def __init__(self, stages, steps, processor):
+        self.stages = stages
+        self.steps = steps
+        self.processor = processor
+
+    def __len__(self):
+        return len(self.stages)
+
+    def apply(self, image):
+        if image is None:
+            return None
+        if image.ndim != 3 or image.shape[2] != 3:
+            # fused stages assume BGR; anything else runs step by step
+            for name, params in self.steps:
+                image = _run_step(self.processor, image, name, params)
+            return image
+        if not self.stages:
+            return image.copy()
+        for stage in self.stages:
+            image = stage.apply(image)
+        return image
+
+    def describe(self):
+        return [' + '.join(stage.ops) for stage in self.stages]
+
+
+def _normalize(step):
+    if isinstance(step, str):
+        return step, {}
+    name, params = step
+    return name, dict(params or {})
+
+
+def _run_step(processor, image, name, params):
+    if name in AdjustmentStack.TYPES:
+        return processor.apply_adjustment(image, name, params.get('value', 0))
+    return processor.apply_filter(image, name, **params)
+
+
+class ChainCompiler:
+    """Turns a list of (name, params) steps into as few passes as possible.
+
+    Consecutive channel-separable ops (invert, contrast, channel removal
+    and isolation) compose into one 256x3 LUT, which is bit-exact with
+    running them one by one. Everything else, including a lone point op,
+    runs through its own implementation as a barrier stage, so a compiled
+    chain always gives the same pixels as the steps did.
+    """
+
+    def __init__(self, processor):
+        self.processor = processor
+
+    def compile(self, steps):
+        steps = [_normalize(step) for step in steps]
+        stages = []
+        for name, params in steps:
+            last = stages[-1] if stages else None
+
+            lut = point_lut(name, params)
+            if lut is not None:
+                if isinstance(last, PointStage):
+                    last.absorb(lut)
+                else:
+                    last = PointStage(lut, self.processor)
+                    stages.append(last)
+                last.ops.append(name)
+                last.steps.append((name, params))
+                continue
+
+            stages.append(OpStage(self._barrier(name, params), name))
+        return CompiledChain(stages, steps, self.processor)
+
+    def _barrier(self, name, params):
+        processor = self.processor
+        return lambda image: _run_step(processor, image, name, params)
@@ -0,0 +1,39 @@
+"""
+Histogram - Per-channel bin counts that can be patched region by region
+Copyright (c) 2024 D-speedster (github.com/D-speedster)
+"""
+import cv2
+import numpy as np
+
+
+def _count(image):
+    channels = 1 if image.ndim == 2 else image.shape[2]
+    if image.size == 0:
+        return np.zeros((channels, 256), dtype=np.int64)
+    return np.stack([cv2.calcHist([image], [c], None, [256], [0, 256]).ravel()
+                     for c in range(channels)]).astype(np.int64)
+
+
+class ImageHistogram:
+    """256-bin counts for every channel of an image.
+
+    After an edit that only touched `rect` = (x1, y1, x2, y2), `update`
+    subtracts the old region's counts and adds the new region's, instead
+    of re-counting the whole image.
+    """
+
+    def __init__(self, image=None):
+        self.counts = None
+        if image is not None:
+            self.reset(image)
+
+    def reset(self, image):
+        self.counts = _count(image)
+
+    def update(self, old, new, rect):
+        if self.counts is None or old.shape != new.shape:
+            self.reset(new)
+            return
+        x1, y1, x2, y2 = rect
+        self.counts -= _count(old[y1:y2, x1:x2])
+        self.counts += _count(new[y1:y2, x1:x2])
@@ -6,8 +6,12 @@ import cv2
 import numpy as np
 from core.filters import Filters
 from core.adjustments import Adjustments
+from core.adjustment_stack import AdjustmentStack
 from core.drawing_tools import DrawingTools
 from core.face_detection import FaceDetector
+from core.tiling import TiledExecutor
+from core.filter_registry import FILTERS, TILE_STRIP, TILE_STAGED, get_spec
+from core.fusion import ChainCompiler
 
 
 class ImageProcessor:
@@ -16,34 +20,28 @@ class ImageProcessor:
         self.adjustments = Adjustments()
         self.drawing_tools = DrawingTools()
         self.face_detector = FaceDetector()
+        self.tiler = TiledExecutor()
+        self._filter_funcs = {name: spec.bind(self.filters) for name, spec in FILTERS.items()}
         
-    def apply_filter(self, image, filter_name, **params):
+    def apply_filter(self, image, filter_name, tiled=False, **params):
         if image is None:
             return None
             
-        methods = {
-            'blur': self.filters.blur,
-            'sharpen': self.filters.sharpen,
-            'edge': self.filters.edge_detection,
-            'emboss': self.filters.emboss,
-            'grayscale': self.filters.grayscale,
-            'sepia': self.filters.sepia,
-            'invert': self.filters.invert,
-            'cartoon': self.filters.cartoon,
-            'median': self.filters.median,
-            'remove_red': lambda img: self.filters.remove_channel(img, 'red'),
-            'remove_green': lambda img: self.filters.remove_channel(img, 'green'),
-            'remove_blue': lambda img: self.filters.remove_channel(img, 'blue'),
-            'only_red': lambda img: self.filters.keep_channel(img, 'red'),
-            'only_green': lambda img: self.filters.keep_channel(img, 'green'),
-            'only_blue': lambda img: self.filters.keep_channel(img, 'blue'),
-            'corners': self.filters.corner_detection,
-            'harris': self.filters.harris_corners,
-        }
+        spec = get_spec(filter_name)
+        if spec is None:
+            return image
+        func = self._filter_funcs[filter_name]
         
-        if filter_name in methods:
-            return methods[filter_name](image, **params)
-        return image
+        if tiled:
+            if spec.tiling == TILE_STAGED:
+                return func(image, tiler=self.tiler, **params)
+            if spec.tiling == TILE_STRIP:
+                halo = spec.halo_for(params)
+                return self.tiler.run(lambda strip: func(strip, **params), image, halo)
+        return func(image, **params)
+        
+    def filter_spec(self, filter_name):
+        return get_spec(filter_name)
         
     def apply_adjustment(self, image, adj_type, value):
         if image is None:
@@ -59,6 +57,19 @@ class ImageProcessor:
             return methods[adj_type](image, value)
         return image
         
+    def apply_adjustments(self, image, **values):
+        if image is None:
+            return None
+        return AdjustmentStack(**values).apply(image)
+        
+    def compile_chain(self, steps):
+        return ChainCompiler(self).compile(steps)
+        
+    def apply_chain(self, image, steps):
+        if image is None:
+            return None
+        return self.compile_chain(steps).apply(image)
+        
     def rotate(self, image, angle):
         if angle == 90:
             return cv2.rotate(image, cv2.ROTATE_90_CLOCKWISE)
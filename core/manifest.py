@@ -0,0 +1,121 @@
+"""
+Manifest - Per-output-folder record of finished batch files
+Copyright (c) 2024 D-speedster (github.com/D-speedster)
+"""
+import hashlib
+import json
+import os
+import threading
+
+
+MANIFEST_NAME = ".photo_editor_manifest.jsonl"
+
+
+def file_digest(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+class Manifest:
+    """Remembers, for every output a batch wrote, the source's size,
+    mtime and content hash, the recipe hash and the output it produced.
+
+    A file is up to date when its output still exists with the recorded
+    size and was made by the same recipe from the same source. Unchanged
+    size and mtime are trusted without reading the source; otherwise the
+    content hash decides, so a touched but unchanged file is not redone.
+
+    Entries are appended one line per finished file, so an interrupted
+    run keeps everything it completed. `force=True` treats every file as
+    out of date but still records the new results.
+    """
+
+    def __init__(self, path, force=False):
+        self.path = path
+        self.force = force
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._file = None
+        self._load()
+
+    @classmethod
+    def for_output(cls, output_dir, force=False):
+        return cls(os.path.join(output_dir, MANIFEST_NAME), force)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _load(self):
+        lines = 0
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        entry = json.loads(line)
+                        self._entries[entry["src"], entry["dst"]] = entry
+                    except (ValueError, KeyError, TypeError):
+                        # a line cut short by a crash
+                        continue
+        except FileNotFoundError:
+            return
+        if lines > 2 * len(self._entries) + 100:
+            self.compact()
+
+    @staticmethod
+    def stat(src):
+        st = os.stat(src)
+        return st.st_size, st.st_mtime_ns
+
+    def is_current(self, src, dst, recipe_hash, stat, digest=None):
+        """Check by stat alone, or by content when `digest` is given."""
+        if self.force:
+            return False
+        entry = self._entries.get((os.path.abspath(src), os.path.abspath(dst)))
+        if entry is None or entry["recipe"] != recipe_hash:
+            return False
+        if digest is None:
+            if [entry["size"], entry["mtime"]] != list(stat):
+                return False
+        elif entry["hash"] != digest:
+            return False
+        try:
+            return os.path.getsize(dst) == entry["out_size"]
+        except OSError:
+            return False
+
+    def record(self, src, dst, recipe_hash, stat, digest):
+        entry = {
+            "src": os.path.abspath(src),
+            "size": stat[0],
+            "mtime": stat[1],
+            "hash": digest,
+            "recipe": recipe_hash,
+            "dst": os.path.abspath(dst),
+            "out_size": os.path.getsize(dst),
+        }
+        with self._lock:
+            self._entries[entry["src"], entry["dst"]] = entry
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+
+    def compact(self):
+        """Rewrite the file with one line per source and output."""
+        with self._lock:
+            self._close_file()
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                for entry in self._entries.values():
+                    f.write(json.dumps(entry) + "\n")
+            os.replace(tmp, self.path)
+
+    def close(self):
+        with self._lock:
+            self._close_file()
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
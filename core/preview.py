@@ -0,0 +1,55 @@
+"""
+Preview Proxy - Cached display-sized copy of an image for live previews
+Copyright (c) 2024 D-speedster (github.com/D-speedster)
+"""
+import cv2
+
+
+class PreviewProxy:
+    """Keeps one downscaled copy of a source image.
+
+    The proxy is rebuilt only when a different image (or a different
+    target box) is requested, so interactive previews run on a few
+    megapixels no matter how large the document is.
+    """
+    DEFAULT_SIZE = (1280, 1280)
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size or self.DEFAULT_SIZE
+        self.scale = 1.0
+        self._source = None
+        self._box = None
+        self._proxy = None
+
+    def get(self, image, size=None):
+        if image is None:
+            return None
+        box = self._box_for(size)
+        if image is not self._source or box != self._box:
+            self._rebuild(image, box)
+        return self._proxy
+
+    def invalidate(self):
+        self._source = None
+        self._box = None
+        self._proxy = None
+        self.scale = 1.0
+
+    def _box_for(self, size):
+        if size is None:
+            return tuple(self.max_size)
+        w, h = size
+        return max(1, int(w)), max(1, int(h))
+
+    def _rebuild(self, image, box):
+        h, w = image.shape[:2]
+        scale = min(1.0, box[0] / w, box[1] / h)
+        if scale < 1.0:
+            new_w = max(1, int(round(w * scale)))
+            new_h = max(1, int(round(h * scale)))
+            self._proxy = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_AREA)
+        else:
+            self._proxy = image
+        self.scale = scale
+        self._source = image
+        self._box = box
@@ -0,0 +1,79 @@
+"""
+Image Pyramid - Lazily built mip levels for zoomed display
+Copyright (c) 2024 D-speedster (github.com/D-speedster)
+"""
+import cv2
+
+
+def _half(image):
+    """Average 2x2 blocks; an odd last row/column is paired with itself."""
+    h, w = image.shape[:2]
+    if h % 2 or w % 2:
+        image = cv2.copyMakeBorder(image, 0, h % 2, 0, w % 2, cv2.BORDER_REPLICATE)
+    return cv2.resize(image, ((w + 1) // 2, (h + 1) // 2), interpolation=cv2.INTER_AREA)
+
+
+class ImagePyramid:
+    """Level 0 is the image itself, every further level halves both sides
+    until the image would drop below `min_size`. Levels are only built when
+    a zoom level first needs them.
+
+    Each level pixel is the mean of an aligned 2x2 block of the level
+    below, so `update` can redo just the blocks under an edited rectangle
+    and get exactly what a full rebuild would.
+    """
+
+    def __init__(self, image, min_size=64):
+        self.min_size = min_size
+        self._levels = [image]
+
+    @property
+    def image(self):
+        return self._levels[0]
+
+    @property
+    def size(self):
+        h, w = self._levels[0].shape[:2]
+        return w, h
+
+    def level(self, index):
+        while len(self._levels) <= index:
+            prev = self._levels[-1]
+            h, w = prev.shape[:2]
+            if min(w, h) // 2 < self.min_size:
+                return prev
+            self._levels.append(_half(prev))
+        return self._levels[index]
+
+    def level_for(self, scale):
+        """Index of the smallest level that still has at least `scale` level-0
+        pixels' worth of resolution, i.e. that never needs upsampling when
+        drawn at `scale`."""
+        index = 0
+        while scale * 2 ** (index + 1) <= 1.0:
+            nxt = self.level(index + 1)
+            if nxt is self.level(index):
+                break
+            index += 1
+        return index
+
+    def factor(self, index):
+        """(x, y) scale of `index` relative to level 0."""
+        f = 0.5 ** min(index, len(self._levels) - 1)
+        return f, f
+
+    def update(self, image, rect):
+        """Swap in `image` (same size as before) whose pixels only changed
+        inside `rect` = (x1, y1, x2, y2), and patch the built levels."""
+        self._levels[0] = image
+        x1, y1, x2, y2 = rect
+        for i in range(1, len(self._levels)):
+            src = self._levels[i - 1]
+            h, w = src.shape[:2]
+            # grow to whole 2x2 blocks
+            x1, y1 = max(0, x1 - x1 % 2), max(0, y1 - y1 % 2)
+            x2, y2 = min(w, x2 + x2 % 2), min(h, y2 + y2 % 2)
+            if x2 <= x1 or y2 <= y1:
+                break
+            x1, y1, x2, y2 = x1 // 2, y1 // 2, (x2 + 1) // 2, (y2 + 1) // 2
+            self._levels[i][y1:y2, x1:x2] = _half(src[y1 * 2:y2 * 2, x1 * 2:x2 * 2])
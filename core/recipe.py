@@ -0,0 +1,229 @@
+"""
+Recipe - Serializable multi-step processing recipes
+Copyright (c) 2024 D-speedster (github.com/D-speedster)
+"""
+import hashlib
+import json
+import os
+
+import cv2
+
+from core.adjustment_stack import AdjustmentStack
+from core.filter_registry import FILTERS
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+
+def _resize(processor, image, width=None, height=None, scale=None):
+    """Give `width`, `height` or both; a missing side keeps the aspect ratio."""
+    h, w = image.shape[:2]
+    if scale is not None:
+        width, height = w * scale, h * scale
+    elif width is None and height is None:
+        raise ValueError("resize needs width, height or scale")
+    elif height is None:
+        height = h * width / w
+    elif width is None:
+        width = w * height / h
+    return processor.resize(image, max(1, int(round(width))), max(1, int(round(height))))
+
+
+def _rotate(processor, image, angle):
+    if angle in (90, -90, 180):
+        return processor.rotate(image, angle)
+    return processor.rotate_free(image, angle)
+
+
+def _text(processor, image, text, position=(10, -10), font_scale=1, color=(255, 255, 255),
+          thickness=2):
+    """Negative coordinates count from the right/bottom edge."""
+    h, w = image.shape[:2]
+    x, y = position
+    if x < 0 or y < 0:
+        (tw, th), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)
+        x = x if x >= 0 else w + x - tw
+        y = y if y >= 0 else h + y
+    return processor.drawing_tools.draw_text(image.copy(), text, (int(x), int(y)),
+                                             font_scale, tuple(color), thickness)
+
+
+OPERATIONS = {
+    'resize': _resize,
+    'rotate': _rotate,
+    'flip': lambda processor, image, direction='horizontal': processor.flip(image, direction),
+    'crop': lambda processor, image, x, y, w, h: processor.crop(image, x, y, w, h),
+    'text': _text,
+    'blur_faces': lambda processor, image, **params:
+        processor.face_detector.blur_faces_advanced(image, **params),
+    'pixelate_faces': lambda processor, image, **params:
+        processor.face_detector.pixelate_faces_advanced(image, **params),
+    'emoji_faces': lambda processor, image, **params:
+        processor.face_detector.add_emoji_advanced(image, **params),
+}
+
+# cv2.imwrite flags for the `quality` output option (PNG has `compression`)
+_QUALITY_FLAGS = {
+    '.jpg': cv2.IMWRITE_JPEG_QUALITY,
+    '.jpeg': cv2.IMWRITE_JPEG_QUALITY,
+    '.webp': cv2.IMWRITE_WEBP_QUALITY,
+}
+
+
+def _is_chain_step(name):
+    return name in FILTERS or name in AdjustmentStack.TYPES
+
+
+def _normalize(step):
+    if isinstance(step, str):
+        return step, {}
+    if isinstance(step, dict):
+        params = dict(step)
+        name = params.pop('op', None)
+        params.update(params.pop('params', None) or {})
+        return name, params
+    name, params = step
+    return name, dict(params or {})
+
+
+class CompiledRecipe:
+    def __init__(self, stages):
+        self.stages = stages
+
+    def apply(self, image):
+        for stage in self.stages:
+            image = stage(image)
+        return image
+
+
+class Recipe:
+    """An ordered list of processing steps plus output settings.
+
+    A step is `{"op": name, **params}` where name is any filter, any
+    adjustment (brightness/contrast/saturation with `value`) or one of
+    OPERATIONS. Runs of filters and adjustments are compiled with
+    ChainCompiler, which fuses channel-wise steps into single passes.
+    `output` may set `format` (e.g. "jpg"), `quality` (0-100, JPEG and
+    WebP), `compression` (0-9, PNG), `suffix` and `template` (see
+    output_path).
+
+    Saved as JSON, or YAML when PyYAML is installed.
+    """
+
+    def __init__(self, steps=None, output=None, name=None):
+        self.name = name
+        self.steps = [_normalize(step) for step in steps or []]
+        self.output = dict(output or {})
+        for op, _ in self.steps:
+            if not (_is_chain_step(op) or op in OPERATIONS):
+                raise ValueError(f"Unknown recipe step: {op}")
+        compression = self.output.get('compression')
+        if compression is not None and not 0 <= int(compression) <= 9:
+            raise ValueError(f"PNG compression must be 0-9, got {compression}")
+
+    @classmethod
+    def from_filter(cls, filter_name, params=None):
+        return cls([(filter_name, params)], name=filter_name)
+
+    @classmethod
+    def from_dict(cls, data):
+        if isinstance(data, list):
+            data = {'steps': data}
+        return cls(data.get('steps'), data.get('output'), data.get('name'))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+        if os.path.splitext(path)[1].lower() in ('.yaml', '.yml'):
+            if yaml is None:
+                raise ValueError("Reading YAML recipes needs PyYAML (pip install pyyaml)")
+            data = yaml.safe_load(text)
+        else:
+            data = json.loads(text)
+        recipe = cls.from_dict(data or {})
+        if recipe.name is None:
+            recipe.name = os.path.splitext(os.path.basename(path))[0]
+        return recipe
+
+    def to_dict(self):
+        data = {'steps': [dict(op=op, **params) for op, params in self.steps]}
+        if self.name:
+            data['name'] = self.name
+        if self.output:
+            data['output'] = dict(self.output)
+        return data
+
+    def save(self, path):
+        data = self.to_dict()
+        with open(path, 'w', encoding='utf-8') as f:
+            if os.path.splitext(path)[1].lower() in ('.yaml', '.yml'):
+                if yaml is None:
+                    raise ValueError("Writing YAML recipes needs PyYAML (pip install pyyaml)")
+                yaml.safe_dump(data, f, sort_keys=False)
+            else:
+                json.dump(data, f, indent=2)
+
+    @property
+    def key(self):
+        """Canonical text of the recipe, equal for equal recipes."""
+        return json.dumps(self.to_dict(), sort_keys=True)
+
+    @property
+    def digest(self):
+        """Hash of what the recipe does to pixels and encoding; the name
+        doesn't count."""
+        data = self.to_dict()
+        data.pop('name', None)
+        return hashlib.sha1(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def compile(self, processor):
+        stages = []
+        run = []
+        for op, params in self.steps + [(None, None)]:
+            if op is not None and _is_chain_step(op):
+                run.append((op, params))
+                continue
+            if run:
+                stages.append(processor.compile_chain(run).apply)
+                run = []
+            if op is not None:
+                func = OPERATIONS[op]
+                stages.append(lambda image, func=func, params=params: func(processor, image, **params))
+        return CompiledRecipe(stages)
+
+    def apply(self, processor, image):
+        return self.compile(processor).apply(image)
+
+    def output_path(self, src, output_dir, template=None, root=None):
+        """Fill `template` (or the `template` output option) with {name},
+        {ext}, {suffix} and {dir}, the folder of `src` relative to `root`.
+
+        The default is "{name}{suffix}.{ext}", or "{dir}/{name}{suffix}.{ext}"
+        when `src` came from a folder or pattern (`root` given), so files
+        from different subfolders keep apart."""
+        name, ext = os.path.splitext(os.path.basename(src))
+        fmt = self.output.get('format')
+        ext = fmt.lower().lstrip('.') if fmt else ext.lstrip('.') or 'png'
+        folder = os.path.relpath(os.path.dirname(src), root) if root else '.'
+        template = template or self.output.get('template') or (
+            "{dir}/{name}{suffix}.{ext}" if root else "{name}{suffix}.{ext}")
+        path = template.format(name=name, ext=ext, suffix=self.output.get('suffix', '_out'),
+                               dir=folder)
+        return os.path.normpath(os.path.join(output_dir, path))
+
+    def encode_params(self, path):
+        ext = os.path.splitext(path)[1].lower()
+        if ext == '.png':
+            compression = self.output.get('compression')
+            return [] if compression is None else [cv2.IMWRITE_PNG_COMPRESSION, int(compression)]
+        quality = self.output.get('quality')
+        flag = _QUALITY_FLAGS.get(ext)
+        if quality is None or flag is None:
+            return []
+        return [flag, int(quality)]
+
+    def describe(self):
+        return ' → '.join(op for op, _ in self.steps)
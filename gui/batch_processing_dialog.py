@@ -1,43 +1,48 @@
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton,
                              QLabel, QListWidget, QComboBox, QGroupBox,
-                             QFileDialog, QProgressBar, QMessageBox)
+                             QFileDialog, QProgressBar, QMessageBox, QSpinBox,
+                             QCheckBox)
 from PyQt5.QtCore import Qt, QThread, pyqtSignal
-import cv2
+import threading
 import os
 
+from core.batch import BatchEngine
+from core.manifest import Manifest
+from core.recipe import Recipe
+
 
 class BatchWorker(QThread):
     progress = pyqtSignal(int)
-    finished = pyqtSignal()
+    status = pyqtSignal(str)
+    finished = pyqtSignal(object)
+    error = pyqtSignal(str)
     
-    def __init__(self, files, filter_name, output_dir, processor):
+    def __init__(self, files, recipe, output_dir, workers=None, resume=True):
         super().__init__()
         self.files = files
-        self.filter_name = filter_name
+        self.recipe = recipe
         self.output_dir = output_dir
-        self.processor = processor
+        self.resume = resume
+        self.engine = BatchEngine(workers)
+        self._stop = threading.Event()
+        
+    def cancel(self):
+        self._stop.set()
         
     def run(self):
-        total = len(self.files)
-        if total == 0:
-            self.finished.emit()
+        try:
+            manifest = Manifest.for_output(self.output_dir, force=not self.resume)
+            report = self.engine.run(self.files, self.output_dir, self.recipe,
+                                     progress=self._report, cancel=self._stop.is_set,
+                                     manifest=manifest)
+        except Exception as e:
+            self.error.emit(str(e))
             return
-            
-        for i, fpath in enumerate(self.files):
-            try:
-                img = cv2.imread(fpath)
-                if img is not None:
-                    processed = self.processor.apply_filter(img, self.filter_name)
-                    fname = os.path.basename(fpath)
-                    name, ext = os.path.splitext(fname)
-                    out_path = os.path.join(self.output_dir, f"{name}_out{ext}")
-                    cv2.imwrite(out_path, processed)
-                    
-                self.progress.emit(int((i + 1) / total * 100))
-            except Exception:
-                continue
-                
-        self.finished.emit()
+        self.finished.emit(report)
+        
+    def _report(self, report):
+        self.progress.emit(report.percent)
+        self.status.emit(f"{report.done}/{report.total} - {report.images_per_second:.1f} images/s")
 
 
 class BatchProcessingDialog(QDialog):
@@ -46,6 +51,7 @@ class BatchProcessingDialog(QDialog):
         self.processor = processor
         self.files = []
         self.output_dir = None
+        self.recipe = None
         self.setWindowTitle("Batch Processing")
         self.setGeometry(200, 200, 600, 500)
         self._setup_ui()
@@ -81,9 +87,28 @@ class BatchProcessingDialog(QDialog):
             "grayscale", "sepia", "invert", "cartoon"
         ])
         filter_lay.addWidget(self.filter_cb)
+        filter_lay.addWidget(QLabel("Workers:"))
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, max(1, (os.cpu_count() or 1) * 2))
+        self.workers_spin.setValue(os.cpu_count() or 1)
+        filter_lay.addWidget(self.workers_spin)
         filter_grp.setLayout(filter_lay)
         layout.addWidget(filter_grp)
         
+        recipe_grp = QGroupBox("Recipe")
+        recipe_lay = QHBoxLayout()
+        self.recipe_label = QLabel("None (single filter)")
+        recipe_lay.addWidget(self.recipe_label, 1)
+        load_btn = QPushButton("Load")
+        load_btn.clicked.connect(self._load_recipe)
+        recipe_lay.addWidget(load_btn)
+        self.clear_recipe_btn = QPushButton("Clear")
+        self.clear_recipe_btn.setEnabled(False)
+        self.clear_recipe_btn.clicked.connect(lambda: self._set_recipe(None))
+        recipe_lay.addWidget(self.clear_recipe_btn)
+        recipe_grp.setLayout(recipe_lay)
+        layout.addWidget(recipe_grp)
+        
         out_grp = QGroupBox("Output Folder")
         out_lay = QHBoxLayout()
         self.out_label = QLabel("Not selected")
@@ -91,17 +116,28 @@ class BatchProcessingDialog(QDialog):
         out_btn = QPushButton("Browse")
         out_btn.clicked.connect(self._select_output)
         out_lay.addWidget(out_btn)
+        self.resume_chk = QCheckBox("Skip up-to-date")
+        self.resume_chk.setChecked(True)
+        self.resume_chk.setToolTip("Only process files whose source or settings changed since the last run")
+        out_lay.addWidget(self.resume_chk)
         out_grp.setLayout(out_lay)
         layout.addWidget(out_grp)
         
         self.progress = QProgressBar()
         layout.addWidget(self.progress)
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
         
         action_lay = QHBoxLayout()
         self.run_btn = QPushButton("Start")
         self.run_btn.clicked.connect(self._start)
         action_lay.addWidget(self.run_btn)
         
+        self.stop_btn = QPushButton("Stop")
+        self.stop_btn.setEnabled(False)
+        self.stop_btn.clicked.connect(self._stop)
+        action_lay.addWidget(self.stop_btn)
+        
         close_btn = QPushButton("Close")
         close_btn.clicked.connect(self.close)
         action_lay.addWidget(close_btn)
@@ -121,6 +157,27 @@ class BatchProcessingDialog(QDialog):
         self.files.clear()
         self.file_list.clear()
         
+    def _load_recipe(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Load Recipe", "",
+            "Recipes (*.json *.yaml *.yml)"
+        )
+        if not path:
+            return
+        try:
+            self._set_recipe(Recipe.load(path))
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Cannot load recipe: {e}")
+            
+    def _set_recipe(self, recipe):
+        self.recipe = recipe
+        self.filter_cb.setEnabled(recipe is None)
+        self.clear_recipe_btn.setEnabled(recipe is not None)
+        if recipe is None:
+            self.recipe_label.setText("None (single filter)")
+        else:
+            self.recipe_label.setText(f"{recipe.name}: {recipe.describe()}")
+            
     def _select_output(self):
         folder = QFileDialog.getExistingDirectory(self, "Select Output Folder")
         if folder:
@@ -137,16 +194,39 @@ class BatchProcessingDialog(QDialog):
             return
             
         self.run_btn.setEnabled(False)
+        self.stop_btn.setEnabled(True)
+        self.progress.setValue(0)
         self.worker = BatchWorker(
-            self.files,
-            self.filter_cb.currentText(),
+            list(self.files),
+            self.recipe or Recipe.from_filter(self.filter_cb.currentText()),
             self.output_dir,
-            self.processor
+            self.workers_spin.value(),
+            self.resume_chk.isChecked()
         )
         self.worker.progress.connect(self.progress.setValue)
+        self.worker.status.connect(self.status_label.setText)
         self.worker.finished.connect(self._on_done)
+        self.worker.error.connect(self._on_error)
         self.worker.start()
         
-    def _on_done(self):
+    def _stop(self):
+        self.stop_btn.setEnabled(False)
+        self.worker.cancel()
+        
+    def _on_error(self, message):
+        self.run_btn.setEnabled(True)
+        self.stop_btn.setEnabled(False)
+        self.status_label.setText("")
+        QMessageBox.critical(self, "Error", f"Batch processing failed: {message}")
+        
+    def _on_done(self, report):
         self.run_btn.setEnabled(True)
-        QMessageBox.information(self, "Done", "Processing completed")
+        self.stop_btn.setEnabled(False)
+        self.status_label.setText(report.summary())
+        if report.failed:
+            lines = [f"{os.path.basename(r.src)}: {r.error}" for r in report.failed[:10]]
+            if len(report.failed) > 10:
+                lines.append(f"... and {len(report.failed) - 10} more")
+            QMessageBox.warning(self, "Done", report.summary() + "\n\n" + "\n".join(lines))
+        else:
+            QMessageBox.information(self, "Done", report.summary())
@@ -1,19 +1,27 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, 
                              QLabel, QCheckBox, QGroupBox, QSpinBox, QFileDialog,
                              QMessageBox, QSlider)
-from PyQt5.QtCore import QTimer, Qt
-from PyQt5.QtGui import QImage, QPixmap
+from PyQt5.QtCore import Qt, pyqtSignal
 from camera.webcam import Webcam
+from camera.pipeline import CameraPipeline, draw_overlay
+from camera.recorder import VideoRecorder
+from core.face_detection import FaceTracker
 import cv2
 import os
+import time
+from utils.display import show_image
 
 
 class CameraWindow(QWidget):
+    # از نخ پردازش؛ نتیجه با pipeline.take() برداشته می‌شود
+    _frame_ready = pyqtSignal()
+    
     def __init__(self, main_window):
         super().__init__()
         self.main = main_window
         self.webcam = Webcam()
-        self.timer = QTimer()
+        self.pipeline = CameraPipeline(self.webcam)
+        self._last_shown = 0.0
         self.setWindowTitle("دوربین")
         self.setGeometry(200, 200, 1000, 750)
         self.setLayoutDirection(Qt.RightToLeft)
@@ -30,7 +38,7 @@ class CameraWindow(QWidget):
         self.processed = None
         
         self.recording = False
-        self.video_writer = None
+        self.recorder = None
         self.paused = False
         self.delay_ms = 30
         
@@ -158,7 +166,7 @@ class CameraWindow(QWidget):
         self.px_spin = QSpinBox()
         self.px_spin.setRange(5, 50)
         self.px_spin.setValue(20)
-        self.px_spin.valueChanged.connect(lambda v: setattr(self, 'pixel_size', v))
+        self.px_spin.valueChanged.connect(self._set_pixel_size)
         px_lay.addWidget(self.px_spin)
         fx_lay.addLayout(px_lay)
         
@@ -177,7 +185,7 @@ class CameraWindow(QWidget):
         right_lay.addStretch()
         main_lay.addLayout(right_lay, stretch=1)
         
-        self.timer.timeout.connect(self._update_frame)
+        self._frame_ready.connect(self._show_result)
         
     def keyPressEvent(self, event):
         if event.key() == Qt.Key_Escape:
@@ -187,14 +195,14 @@ class CameraWindow(QWidget):
             self._toggle_pause()
         
     def _on_delay_change(self, val):
+        # حداقل فاصله بین دو نمایش؛ ضبط و پردازش را کند نمی‌کند
         self.delay_ms = val
         self.delay_label.setText(str(val))
-        if self.timer.isActive():
-            self.timer.setInterval(val)
         
     def _start(self):
         if self.webcam.start():
-            self.timer.start(self.delay_ms)
+            self._update_stages()
+            self.pipeline.start(self._frame_ready.emit)
             self.start_btn.setEnabled(False)
             self.pause_btn.setEnabled(True)
             self.capture_btn.setEnabled(True)
@@ -206,7 +214,7 @@ class CameraWindow(QWidget):
     def _stop(self):
         if self.recording:
             self._stop_recording()
-        self.timer.stop()
+        self.pipeline.stop()
         self.webcam.stop()
         self.display.clear()
         self.start_btn.setEnabled(True)
@@ -218,14 +226,13 @@ class CameraWindow(QWidget):
         self.pause_btn.setText("⏸️ توقف")
         
     def _toggle_pause(self):
-        if not self.timer.isActive() and not self.paused:
+        if not self.webcam.is_running:
             return
         self.paused = not self.paused
+        self.pipeline.pause(self.paused)
         if self.paused:
-            self.timer.stop()
             self.pause_btn.setText("▶️ ادامه")
         else:
-            self.timer.start(self.delay_ms)
             self.pause_btn.setText("⏸️ توقف")
             
     def _toggle_recording(self):
@@ -244,97 +251,120 @@ class CameraWindow(QWidget):
             path += '.avi'
             
         if self.frame is not None:
-            h, w = self.frame.shape[:2]
-            fourcc = cv2.VideoWriter_fourcc(*'XVID')
-            fps = 1000 / self.delay_ms
-            self.video_writer = cv2.VideoWriter(path, fourcc, fps, (w, h), not self.grayscale_mode)
+            # نرخ واقعی دوربین؛ زمان‌بندی فریم‌ها از timestamp ضبط می‌آید
+            fps = round(self.webcam.fps) or 30
+            self.recorder = VideoRecorder(path, fps, 'XVID', not self.grayscale_mode)
+            self.pipeline.recorder = self.recorder
             self.recording = True
             self.rec_btn.setText("⏹️ پایان ضبط")
             self.rec_status.setText("🔴 در حال ضبط...")
             self.rec_status.setStyleSheet("color: red; font-weight: bold;")
             
     def _stop_recording(self):
-        if self.video_writer is not None:
-            self.video_writer.release()
-            self.video_writer = None
+        self.pipeline.recorder = None
+        error = None
+        if self.recorder is not None:
+            self.recorder.stop()
+            error = self.recorder.error
+            self.recorder = None
         self.recording = False
         self.rec_btn.setText("🔴 شروع ضبط")
-        self.rec_status.setText("✅ ذخیره شد")
-        self.rec_status.setStyleSheet("color: green;")
-        
-    def _update_frame(self):
-        frame = self.webcam.get_frame()
-        if frame is None:
-            err = self.webcam.get_error()
-            if err:
-                self.display.setText(f"خطا: {err}")
-            return
+        if error:
+            self.rec_status.setText(f"❌ {error}")
+            self.rec_status.setStyleSheet("color: red;")
+        else:
+            self.rec_status.setText("✅ ذخیره شد")
+            self.rec_status.setStyleSheet("color: green;")
+        
+    def _update_stages(self):
+        """ساخت مراحل تشخیص و رندر پایپلاین از تنظیمات فعلی"""
+        detector = self.main.processor.face_detector
+        gray = self.grayscale_mode
+        
+        def prepare(image):
+            if gray:
+                image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+                image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+            return image
             
-        self.frame = frame.copy()
-        processed = frame.copy()
-        
-        # اعمال حالت خاکستری
-        if self.grayscale_mode:
-            processed = cv2.cvtColor(processed, cv2.COLOR_BGR2GRAY)
-            processed = cv2.cvtColor(processed, cv2.COLOR_GRAY2BGR)
-        
-        detector = self.main.processor.face_detection
-        
+        # تشخیص کامل هر چند فریم، بین آن‌ها ردیابی
+        track = FaceTracker(detector).update
+        detect = render = None
         if self.blur_mode:
-            processed = detector.blur_faces(processed)
-            count = detector.count_faces(frame)
-            self.face_info.setText(f"محو شده: {count}")
+            detect = track
+            render = lambda img, faces: (detector.blur_regions(prepare(img), faces),
+                                         f"محو شده: {len(faces)}")
         elif self.pixel_mode:
-            processed = detector.pixelate_faces(processed, self.pixel_size)
-            count = detector.count_faces(frame)
-            self.face_info.setText(f"پیکسلی: {count}")
+            size = self.pixel_size
+            detect = track
+            render = lambda img, faces: (detector.pixelate_regions(prepare(img), faces, size),
+                                         f"پیکسلی: {len(faces)}")
         elif self.emoji_mode:
-            processed = detector.add_emoji_to_faces(processed, 'sunglasses')
-            count = detector.count_faces(frame)
-            self.face_info.setText(f"چهره‌ها: {count}")
+            detect = track
+            render = lambda img, faces: (detector.draw_emoji(prepare(img), faces, 'sunglasses'),
+                                         f"چهره‌ها: {len(faces)}")
         elif self.face_detect:
-            processed, data = detector.detect_faces(processed, self.detect_eyes, self.detect_smile)
-            info = f"چهره‌ها: {len(data)}"
-            if self.detect_eyes:
-                eyes = sum(len(f['eyes']) for f in data)
-                info += f" | چشم: {eyes}"
-            if self.detect_smile:
-                smiles = sum(len(f['smiles']) for f in data)
-                info += f" | لبخند: {smiles}"
-            self.face_info.setText(info)
-        else:
-            self.face_info.setText("چهره‌ها: 0")
-        
-        # ذخیره در ویدیو
-        if self.recording and self.video_writer is not None:
-            if self.grayscale_mode:
-                gray = cv2.cvtColor(processed, cv2.COLOR_BGR2GRAY)
-                self.video_writer.write(gray)
+            eyes, smile = self.detect_eyes, self.detect_smile
+            if eyes or smile:
+                detect = lambda img: detector.detect_faces_advanced(img, eyes, smile)[1]
             else:
-                self.video_writer.write(processed)
+                detect = lambda img: [{'rect': r, 'eyes': [], 'smiles': []} for r in track(img)]
+            render = lambda img, data: (detector.draw_detections(prepare(img), data),
+                                        self._face_text(data, eyes, smile))
+        else:
+            render = lambda img, _: (prepare(img), "چهره‌ها: 0")
+        self.pipeline.set_stages(detect, render)
+        
+    @staticmethod
+    def _face_text(data, eyes, smile):
+        info = f"چهره‌ها: {len(data)}"
+        if eyes:
+            info += f" | چشم: {sum(len(f['eyes']) for f in data)}"
+        if smile:
+            info += f" | لبخند: {sum(len(f['smiles']) for f in data)}"
+        return info
+        
+    def _show_result(self):
+        result = self.pipeline.take()
+        if result is None:
+            err = self.webcam.get_error()
+            if err and not self.webcam.is_running:
+                self.display.setText(f"خطا: {err}")
+            return
+        if self.paused:
+            return
+            
+        self.frame = result.frame.image
+        processed = result.image
+        self.face_info.setText(result.info)
         
         # نمایش
-        rgb = cv2.cvtColor(processed, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb.shape
-        qimg = QImage(rgb.tobytes(), w, h, ch * w, QImage.Format_RGB888)
-        pixmap = QPixmap.fromImage(qimg)
-        scaled = pixmap.scaled(self.display.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        self.display.setPixmap(scaled)
+        now = time.monotonic()
+        if now - self._last_shown >= self.delay_ms / 1000:
+            self._last_shown = now
+            show_image(self.display, draw_overlay(processed, self.pipeline.stats))
         self.processed = processed
         
+    def _set_pixel_size(self, value):
+        self.pixel_size = value
+        self._update_stages()
+        
     def _toggle_grayscale(self, state):
         self.grayscale_mode = state == Qt.Checked
-            
+        self._update_stages()
+    
     def _toggle_face(self, state):
         self.face_detect = state == Qt.Checked
         if self.face_detect:
             self.blur_chk.setChecked(False)
             self.pixel_chk.setChecked(False)
             self.emoji_chk.setChecked(False)
+        self._update_stages()
     
     def _update_settings(self):
         self.detect_eyes = self.eyes_chk.isChecked()
         self.detect_smile = self.smile_chk.isChecked()
+        self._update_stages()
     
     def _toggle_blur(self, state):
         self.blur_mode = state == Qt.Checked
@@ -342,6 +372,7 @@ class CameraWindow(QWidget):
             self.face_chk.setChecked(False)
             self.pixel_chk.setChecked(False)
             self.emoji_chk.setChecked(False)
+        self._update_stages()
     
     def _toggle_pixel(self, state):
         self.pixel_mode = state == Qt.Checked
@@ -349,6 +380,7 @@ class CameraWindow(QWidget):
             self.face_chk.setChecked(False)
             self.blur_chk.setChecked(False)
             self.emoji_chk.setChecked(False)
+        self._update_stages()
     
     def _toggle_emoji(self, state):
         self.emoji_mode = state == Qt.Checked
@@ -356,6 +388,7 @@ class CameraWindow(QWidget):
             self.face_chk.setChecked(False)
             self.blur_chk.setChecked(False)
             self.pixel_chk.setChecked(False)
+        self._update_stages()
     
     def _capture(self):
         img = self.processed if self.processed is not None else self.frame
@@ -72,16 +72,9 @@ class ColorPickerTool(QWidget):
         if self.parent_window.current_image is None:
             return
             
-        label = self.parent_window.image_label
         img = self.parent_window.current_image
         img_h, img_w = img.shape[:2]
-        
-        scale_w = img_w / label.size().width()
-        scale_h = img_h / label.size().height()
-        scale = max(scale_w, scale_h)
-        
-        x = int(pos.x() * scale)
-        y = int(pos.y() * scale)
+        x, y = self.parent_window.image_label.map_to_image(pos)
         
         if 0 <= x < img_w and 0 <= y < img_h:
             b, g, r = img[y, x]
@@ -1,8 +1,8 @@
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QSlider
 from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QPixmap, QImage
 import cv2
 import numpy as np
+from utils.display import show_image
 
 
 class ComparisonWindow(QWidget):
@@ -81,9 +81,4 @@ class ComparisonWindow(QWidget):
         self._show_image(combined)
         
     def _show_image(self, image):
-        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb.shape
-        qimg = QImage(rgb.tobytes(), w, h, ch * w, QImage.Format_RGB888)
-        pixmap = QPixmap.fromImage(qimg)
-        scaled = pixmap.scaled(self.display.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        self.display.setPixmap(scaled)
+        show_image(self.display, image)
@@ -1,8 +1,8 @@
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton, 
                              QLabel, QSpinBox, QGroupBox)
 from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QPixmap, QImage
 import cv2
+from utils.display import show_image
 
 
 class CropDialog(QDialog):
@@ -84,12 +84,7 @@ class CropDialog(QDialog):
         y2 = min(self.crop_y + self.crop_h, self.img_h)
         cv2.rectangle(preview_img, (self.crop_x, self.crop_y), (x2, y2), (0, 255, 0), 2)
         
-        rgb = cv2.cvtColor(preview_img, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb.shape
-        qimg = QImage(rgb.tobytes(), w, h, ch * w, QImage.Format_RGB888)
-        pixmap = QPixmap.fromImage(qimg)
-        scaled = pixmap.scaled(self.preview.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        self.preview.setPixmap(scaled)
+        show_image(self.preview, preview_img)
         
     def get_cropped_image(self):
         x2 = min(self.crop_x + self.crop_w, self.img_w)
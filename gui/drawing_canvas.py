@@ -1,9 +1,18 @@
-from PyQt5.QtWidgets import QLabel, QColorDialog, QInputDialog
-from PyQt5.QtCore import Qt, QPoint
-from PyQt5.QtGui import QPainter, QPen, QPixmap, QImage
+from collections import OrderedDict
+
+from PyQt5.QtWidgets import QLabel, QColorDialog, QInputDialog, QAbstractScrollArea
+from PyQt5.QtCore import Qt, QPoint, QRect, QEvent
+from PyQt5.QtGui import QPainter, QPen
 import cv2
 import numpy as np
 
+from core.pyramid import ImagePyramid
+from utils.display import to_pixmap
+
+
+TILE_SIZE = 256
+MAX_TILES = 512
+
 
 class DrawingCanvas(QLabel):
     def __init__(self, parent=None):
@@ -13,12 +22,22 @@ class DrawingCanvas(QLabel):
         self.current_tool = None
         self.start_point = None
         self.end_point = None
-        self.temp_pixmap = None
         self.draw_color = (0, 255, 0)
         self.line_thickness = 3
         self.active_mode = None
         self.selection_tool = None
         self.color_picker = None
+        self.shape_preview = None       # (tool, start, end) while dragging a shape
+        self.selection_preview = None   # ('drag', start, end) or ('final', rect)
+        
+        # view state: zoom is relative to fitting the image in the viewport
+        self.zoom = 1.0
+        self._pyramid = None
+        self._doc_size = None
+        self._scale = 1.0
+        self._origin = QPoint(0, 0)
+        self._tiles = OrderedDict()
+        self._viewport = None
         
     def set_tool(self, tool_name):
         self.current_tool = tool_name
@@ -55,14 +74,182 @@ class DrawingCanvas(QLabel):
         if color.isValid():
             self.draw_color = (color.blue(), color.green(), color.red())
             
+    # ---- display -------------------------------------------------------
+    
+    def set_image(self, image, size=None):
+        """Show `image`. `size` is the (w, h) of the document it stands for,
+        when a downscaled preview is shown in place of the full image."""
+        if image is None:
+            return
+        h, w = image.shape[:2]
+        self._pyramid = ImagePyramid(image)
+        self._doc_size = tuple(size) if size else (w, h)
+        self._tiles.clear()
+        self.shape_preview = None
+        self.selection_preview = None
+        self.setText("")
+        self._watch_viewport()
+        self._relayout()
+        self.update()
+        
+    def update_region(self, image, rect):
+        """Show `image`, which differs from the displayed one only inside
+        `rect` = (x1, y1, x2, y2): patch the pyramid and re-render just the
+        screen tiles over that rectangle."""
+        pyramid = self._pyramid
+        if (pyramid is None or pyramid.image.shape != image.shape
+                or self._doc_size != pyramid.size):
+            self.set_image(image)
+            return
+        h, w = image.shape[:2]
+        x1, y1, x2, y2 = rect
+        x1, y1 = max(0, x1), max(0, y1)
+        x2, y2 = min(w, x2), min(h, y2)
+        self.shape_preview = None
+        self.selection_preview = None
+        if x2 <= x1 or y2 <= y1:
+            pyramid.update(image, (0, 0, 0, 0))
+            self.update()
+            return
+        pyramid.update(image, (x1, y1, x2, y2))
+        
+        # screen-space rect, grown by a pixel for the interpolation footprint
+        s = self._scale
+        sx1, sy1 = int(x1 * s) - 1, int(y1 * s) - 1
+        sx2, sy2 = int(np.ceil(x2 * s)) + 1, int(np.ceil(y2 * s)) + 1
+        for key in [k for k in self._tiles
+                    if k[0] * TILE_SIZE < sx2 and (k[0] + 1) * TILE_SIZE > sx1
+                    and k[1] * TILE_SIZE < sy2 and (k[1] + 1) * TILE_SIZE > sy1]:
+            del self._tiles[key]
+        self.update()
+        
+    def set_zoom(self, level):
+        self.zoom = level / 100.0
+        self._relayout()
+        self.update()
+        
+    def display_scale(self):
+        return self._scale
+        
+    def display_size(self):
+        if self._doc_size is None:
+            return self.width(), self.height()
+        w, h = self._doc_size
+        return max(1, int(w * self._scale)), max(1, int(h * self._scale))
+        
+    def map_to_image(self, pos):
+        """Widget position -> document pixel (not clamped)."""
+        x = (pos.x() - self._origin.x()) / self._scale
+        y = (pos.y() - self._origin.y()) / self._scale
+        return int(np.floor(x)), int(np.floor(y))
+        
+    def map_from_image(self, x, y):
+        return QPoint(int(round(x * self._scale)) + self._origin.x(),
+                      int(round(y * self._scale)) + self._origin.y())
+        
+    def _watch_viewport(self):
+        parent = self.parentWidget()
+        if parent is None or parent is self._viewport:
+            return
+        if isinstance(parent.parentWidget(), QAbstractScrollArea):
+            parent.installEventFilter(self)
+            self._viewport = parent
+            
+    def eventFilter(self, obj, event):
+        if obj is self._viewport and event.type() == QEvent.Resize:
+            self._relayout()
+        return False
+        
+    def _fit_scale(self):
+        area = self._viewport.size() if self._viewport is not None else self.size()
+        m = self.contentsMargins()
+        aw = max(1, area.width() - m.left() - m.right())
+        ah = max(1, area.height() - m.top() - m.bottom())
+        w, h = self._doc_size
+        return min(aw / w, ah / h)
+        
+    def _relayout(self):
+        if self._pyramid is None:
+            return
+        scale = max(1e-4, self._fit_scale() * self.zoom)
+        if scale != self._scale:
+            self._scale = scale
+            self._tiles.clear()
+        dw, dh = self.display_size()
+        m = self.contentsMargins()
+        self.setMinimumSize(dw + m.left() + m.right(), dh + m.top() + m.bottom())
+        r = self.contentsRect()
+        self._origin = QPoint(r.x() + max(0, (r.width() - dw) // 2),
+                              r.y() + max(0, (r.height() - dh) // 2))
+        
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._relayout()
+        
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self._pyramid is None:
+            return
+        painter = QPainter(self)
+        dw, dh = self.display_size()
+        ox, oy = self._origin.x(), self._origin.y()
+        # only the tiles under the exposed part of the viewport are touched
+        visible = event.rect().translated(-ox, -oy).intersected(QRect(0, 0, dw, dh))
+        if not visible.isEmpty():
+            for ty in range(visible.top() // TILE_SIZE, visible.bottom() // TILE_SIZE + 1):
+                for tx in range(visible.left() // TILE_SIZE, visible.right() // TILE_SIZE + 1):
+                    painter.drawPixmap(ox + tx * TILE_SIZE, oy + ty * TILE_SIZE,
+                                       self._tile(tx, ty, dw, dh))
+        self._paint_overlay(painter)
+        painter.end()
+        
+    def _tile(self, tx, ty, dw, dh):
+        key = (tx, ty)
+        pix = self._tiles.get(key)
+        if pix is not None:
+            self._tiles.move_to_end(key)
+            return pix
+            
+        pyramid = self._pyramid
+        x0, y0 = tx * TILE_SIZE, ty * TILE_SIZE
+        tw, th = min(TILE_SIZE, dw - x0), min(TILE_SIZE, dh - y0)
+        
+        # screen pixels per level-0 pixel, per axis
+        src_w, src_h = pyramid.size
+        sx = self._scale * self._doc_size[0] / src_w
+        sy = self._scale * self._doc_size[1] / src_h
+        index = pyramid.level_for(min(sx, sy))
+        fx, fy = pyramid.factor(index)
+        kx, ky = sx / fx, sy / fy
+        # pixel-centre aligned scale + offset, so neighbouring tiles meet exactly
+        m = np.float32([[kx, 0, 0.5 * kx - 0.5 - x0],
+                        [0, ky, 0.5 * ky - 0.5 - y0]])
+        tile = cv2.warpAffine(pyramid.level(index), m, (tw, th),
+                              flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+        pix = to_pixmap(tile)
+        
+        self._tiles[key] = pix
+        while len(self._tiles) > MAX_TILES:
+            self._tiles.popitem(last=False)
+        return pix
+        
+    def _paint_overlay(self, painter):
+        if self.shape_preview:
+            self._paint_shape_preview(painter, *self.shape_preview)
+        if self.selection_preview:
+            kind, *args = self.selection_preview
+            if kind == 'drag':
+                self._paint_selection_drag(painter, *args)
+            else:
+                self._paint_selection_final(painter, *args)
+                
+    # ---- mouse ---------------------------------------------------------
+    
     def mousePressEvent(self, event):
         if event.button() != Qt.LeftButton:
             return
             
         if self.active_mode == 'selection' and self.selection_tool:
-            # ذخیره pixmap برای پیش‌نمایش
-            if self.pixmap():
-                self.temp_pixmap = self.pixmap().copy()
             self.selection_tool.handle_mouse_press(event.pos())
             return
             
@@ -73,42 +260,19 @@ class DrawingCanvas(QLabel):
         if self.current_tool:
             self.drawing = True
             self.start_point = event.pos()
-            self.temp_pixmap = self.pixmap().copy() if self.pixmap() else None
             
     def mouseMoveEvent(self, event):
         if self.active_mode == 'selection' and self.selection_tool:
             self.selection_tool.handle_mouse_move(event.pos())
             # نمایش کادر انتخاب در حین کشیدن
-            if self.selection_tool.state.selecting and self.temp_pixmap:
+            if self.selection_tool.state.selecting:
                 self._draw_selection_preview(event.pos())
             return
             
-        if self.drawing and self.temp_pixmap:
+        if self.drawing:
             self.end_point = event.pos()
-            preview_pixmap = self.temp_pixmap.copy()
-            painter = QPainter(preview_pixmap)
-            pen = QPen(Qt.green, self.line_thickness)
-            painter.setPen(pen)
-            
-            if self.current_tool == "line":
-                painter.drawLine(self.start_point, self.end_point)
-            elif self.current_tool == "rectangle":
-                painter.drawRect(self.start_point.x(), self.start_point.y(),
-                               self.end_point.x() - self.start_point.x(),
-                               self.end_point.y() - self.start_point.y())
-            elif self.current_tool == "circle":
-                radius = int(((self.end_point.x() - self.start_point.x())**2 + 
-                            (self.end_point.y() - self.start_point.y())**2)**0.5)
-                painter.drawEllipse(self.start_point, radius, radius)
-            elif self.current_tool == "ellipse":
-                w = abs(self.end_point.x() - self.start_point.x())
-                h = abs(self.end_point.y() - self.start_point.y())
-                x = min(self.start_point.x(), self.end_point.x())
-                y = min(self.start_point.y(), self.end_point.y())
-                painter.drawEllipse(x, y, w, h)
-                
-            painter.end()
-            self.setPixmap(preview_pixmap)
+            self.shape_preview = (self.current_tool, self.start_point, self.end_point)
+            self.update()
             
     def mouseReleaseEvent(self, event):
         if event.button() != Qt.LeftButton:
@@ -116,39 +280,29 @@ class DrawingCanvas(QLabel):
             
         if self.active_mode == 'selection' and self.selection_tool:
             self.selection_tool.handle_mouse_release(event.pos())
-            # برگرداندن تصویر اصلی و نمایش کادر نهایی
-            if self.temp_pixmap:
-                self._draw_final_selection()
-            self.temp_pixmap = None
+            # نمایش کادر نهایی
+            self._draw_final_selection()
             return
             
         if self.drawing:
             self.drawing = False
             self.end_point = event.pos()
+            self.shape_preview = None
+            self.update()
             
             if self.parent_window and self.parent_window.current_image is not None:
                 self.draw_on_image()
                 
             self.start_point = None
             self.end_point = None
-            self.temp_pixmap = None
             
     def draw_on_image(self):
         if not self.start_point or not self.end_point:
             return
             
         image = self.parent_window.current_image.copy()
-        label_size = self.size()
-        img_h, img_w = image.shape[:2]
-        
-        scale_w = img_w / label_size.width()
-        scale_h = img_h / label_size.height()
-        scale = max(scale_w, scale_h)
-        
-        x1 = int(self.start_point.x() * scale)
-        y1 = int(self.start_point.y() * scale)
-        x2 = int(self.end_point.x() * scale)
-        y2 = int(self.end_point.y() * scale)
+        x1, y1 = self.map_to_image(self.start_point)
+        x2, y2 = self.map_to_image(self.end_point)
         
         if self.current_tool == "line" and self.shape_settings:
             color = self.shape_settings['line_color']
@@ -192,11 +346,19 @@ class DrawingCanvas(QLabel):
                 else:
                     image = self._draw_english_text(image, text, x1, y1)
         
-        self.parent_window.current_image = image
-        self.parent_window.history.add_state(image.copy())
-        self.parent_window.display_image(image)
+        self.parent_window.commit_image(image, self._shape_rect(x1, y1, x2, y2))
         self.set_tool(None)
         
+    def _shape_rect(self, x1, y1, x2, y2):
+        """Bounding box touched by the current shape, or None if unknown."""
+        if self.current_tool == "text" or not self.shape_settings:
+            return None
+        pad = self.shape_settings.get('thickness', 1) + 2
+        if self.current_tool == "circle":
+            r = int(((x2 - x1)**2 + (y2 - y1)**2)**0.5)
+            return (x1 - r - pad, y1 - r - pad, x1 + r + pad + 1, y1 + r + pad + 1)
+        return (min(x1, x2) - pad, min(y1, y2) - pad, max(x1, x2) + pad + 1, max(y1, y2) + pad + 1)
+        
     def _draw_persian_text(self, image, text, x, y):
         from PIL import Image as PILImage, ImageDraw, ImageFont
         try:
@@ -245,19 +407,37 @@ class DrawingCanvas(QLabel):
     
     def _draw_selection_preview(self, current_pos):
         """نمایش کادر انتخاب در حین کشیدن"""
-        if not self.temp_pixmap or not self.selection_tool:
-            return
-            
-        start = self.selection_tool.state.start
-        if not start:
+        if not self.selection_tool or not self.selection_tool.state.start:
             return
-            
-        preview = self.temp_pixmap.copy()
-        painter = QPainter(preview)
+        self.selection_preview = ('drag', self.selection_tool.state.start, current_pos)
+        self.update()
+    
+    def _draw_final_selection(self):
+        """نمایش کادر انتخاب نهایی"""
+        rect = self.selection_tool.state.rect if self.selection_tool else None
+        self.selection_preview = ('final', rect) if rect else None
+        self.update()
         
+    def _paint_shape_preview(self, painter, tool, start, end):
+        painter.setPen(QPen(Qt.green, self.line_thickness))
+        painter.setBrush(Qt.NoBrush)
+        if tool == "line":
+            painter.drawLine(start, end)
+        elif tool == "rectangle":
+            painter.drawRect(start.x(), start.y(), end.x() - start.x(), end.y() - start.y())
+        elif tool == "circle":
+            radius = int(((end.x() - start.x())**2 + (end.y() - start.y())**2)**0.5)
+            painter.drawEllipse(start, radius, radius)
+        elif tool == "ellipse":
+            w = abs(end.x() - start.x())
+            h = abs(end.y() - start.y())
+            painter.drawEllipse(min(start.x(), end.x()), min(start.y(), end.y()), w, h)
+            
+    def _paint_selection_drag(self, painter, start, current_pos):
         # کادر با خط‌چین آبی
         pen = QPen(Qt.cyan, 2, Qt.DashLine)
         painter.setPen(pen)
+        painter.setBrush(Qt.NoBrush)
         
         x1, y1 = start.x(), start.y()
         x2, y2 = current_pos.x(), current_pos.y()
@@ -270,23 +450,11 @@ class DrawingCanvas(QLabel):
         painter.setPen(QPen(Qt.white))
         painter.drawText(min(x1, x2) + 5, min(y1, y2) - 5, f"{w} × {h}")
         
-        painter.end()
-        self.setPixmap(preview)
-    
-    def _draw_final_selection(self):
-        """نمایش کادر انتخاب نهایی"""
-        if not self.selection_tool or not self.selection_tool.state.rect:
-            if self.temp_pixmap:
-                self.setPixmap(self.temp_pixmap)
-            return
-            
-        rect = self.selection_tool.state.rect
-        preview = self.temp_pixmap.copy()
-        painter = QPainter(preview)
-        
+    def _paint_selection_final(self, painter, rect):
         # کادر نهایی با خط ثابت
         pen = QPen(Qt.cyan, 2, Qt.SolidLine)
         painter.setPen(pen)
+        painter.setBrush(Qt.NoBrush)
         painter.drawRect(rect)
         
         # گوشه‌های کادر (handles)
@@ -300,6 +468,3 @@ class DrawingCanvas(QLabel):
         ]
         for cx, cy in corners:
             painter.drawRect(cx - handle_size//2, cy - handle_size//2, handle_size, handle_size)
-        
-        painter.end()
-        self.setPixmap(preview)
@@ -2,8 +2,7 @@ from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton,
                              QLabel, QCheckBox, QGroupBox, QRadioButton, 
                              QButtonGroup, QMessageBox, QSpinBox)
 from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QPixmap, QImage
-import cv2
+from utils.display import show_image
 
 
 class FaceDetectionDialog(QDialog):
@@ -141,17 +140,20 @@ class FaceDetectionDialog(QDialog):
                 if self.smile_chk.isChecked():
                     info += f" | لبخند: {sum(len(f['smiles']) for f in data)}"
                 self.info_lbl.setText(info)
-            elif mode == 2:
-                self.result = self.detector.blur_faces_advanced(self.original, min_s, acc)
-                self.info_lbl.setText(f"محو: {self.detector.count_faces_advanced(self.original, min_s, acc)}")
-            elif mode == 3:
-                self.result = self.detector.pixelate_faces_advanced(
-                    self.original, self.px_spin.value(), min_s, acc)
-                self.info_lbl.setText(f"پیکسلی: {self.detector.count_faces_advanced(self.original, min_s, acc)}")
-            elif mode == 4:
-                etype = 'sunglasses' if self.emoji_grp.checkedId() == 1 else 'mask'
-                self.result = self.detector.add_emoji_advanced(self.original, etype, min_s, acc)
-                self.info_lbl.setText(f"ایموجی: {self.detector.count_faces_advanced(self.original, min_s, acc)}")
+            else:
+                # یک بار تشخیص، برای افکت و شمارش
+                faces = self.detector.detect(self.original, min_s, acc)
+                if mode == 2:
+                    self.result = self.detector.blur_regions(self.original, faces)
+                    self.info_lbl.setText(f"محو: {len(faces)}")
+                elif mode == 3:
+                    self.result = self.detector.pixelate_regions(
+                        self.original, faces, self.px_spin.value())
+                    self.info_lbl.setText(f"پیکسلی: {len(faces)}")
+                elif mode == 4:
+                    etype = 'sunglasses' if self.emoji_grp.checkedId() == 1 else 'mask'
+                    self.result = self.detector.draw_emoji(self.original, faces, etype)
+                    self.info_lbl.setText(f"ایموجی: {len(faces)}")
             
             if self.result is not None:
                 self._show_image(self.result)
@@ -160,11 +162,7 @@ class FaceDetectionDialog(QDialog):
     
     def _show_image(self, img):
         if img is None: return
-        rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        h, w, c = rgb.shape
-        qimg = QImage(rgb.tobytes(), w, h, c * w, QImage.Format_RGB888)
-        pix = QPixmap.fromImage(qimg).scaled(self.preview.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        self.preview.setPixmap(pix)
+        show_image(self.preview, img)
     
     def get_processed_image(self):
         return self.result if self.result is not None else self.original
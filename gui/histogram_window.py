@@ -1,14 +1,17 @@
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel
 from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QPixmap, QImage
 import cv2
 import numpy as np
 
+from core.histogram import ImageHistogram
+from utils.display import to_pixmap
+
 
 class HistogramWindow(QWidget):
     def __init__(self, image, parent=None):
         super().__init__(parent)
         self.image = image
+        self.histogram = ImageHistogram(image)
         self.setWindowTitle("Histogram")
         self.setGeometry(300, 300, 800, 400)
         self._setup_ui()
@@ -16,25 +19,34 @@ class HistogramWindow(QWidget):
     def _setup_ui(self):
         layout = QVBoxLayout(self)
         
-        hist_img = self._create_histogram()
+        self.label = QLabel()
+        self.label.setAlignment(Qt.AlignCenter)
+        self._refresh()
+        
+        layout.addWidget(self.label)
         
-        label = QLabel()
-        label.setAlignment(Qt.AlignCenter)
+    def set_image(self, image):
+        self.image = image
+        self.histogram.reset(image)
+        self._refresh()
         
-        h, w, ch = hist_img.shape
-        qimg = QImage(hist_img.tobytes(), w, h, ch * w, QImage.Format_RGB888)
-        label.setPixmap(QPixmap.fromImage(qimg))
+    def update_region(self, old, new, rect):
+        self.image = new
+        self.histogram.update(old, new, rect)
+        self._refresh()
         
-        layout.addWidget(label)
+    def _refresh(self):
+        self.label.setPixmap(to_pixmap(self._create_histogram()))
         
     def _create_histogram(self):
         hist_w, hist_h = 768, 400
         hist_img = np.ones((hist_h, hist_w, 3), dtype=np.uint8) * 255
         
+        # BGR, in channel order
         colors = [(255, 0, 0), (0, 255, 0), (0, 0, 255)]
         
-        for i, color in enumerate(colors):
-            hist = cv2.calcHist([self.image], [i], None, [256], [0, 256])
+        for i, color in enumerate(colors[:len(self.histogram.counts)]):
+            hist = self.histogram.counts[i].astype(np.float32)
             cv2.normalize(hist, hist, 0, hist_h, cv2.NORM_MINMAX)
             
             bin_w = hist_w // 256
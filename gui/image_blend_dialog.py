@@ -1,9 +1,12 @@
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton,
                              QLabel, QSlider, QGroupBox, QFileDialog, QComboBox)
 from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QPixmap, QImage
 import cv2
 
+from core.preview import PreviewProxy
+from utils.display import show_image
+from utils.preview_scheduler import PreviewScheduler
+
 
 class ImageBlendDialog(QDialog):
     def __init__(self, image, processor, parent=None):
@@ -11,7 +14,10 @@ class ImageBlendDialog(QDialog):
         self.image1 = image
         self.image2 = None
         self.processor = processor
-        self.result = None
+        self.proxy1 = PreviewProxy()
+        self.proxy2 = PreviewProxy()
+        self.scheduler = PreviewScheduler(self)
+        self.scheduler.ready.connect(self._show_image)
         self.setWindowTitle("ادغام تصاویر")
         self.setGeometry(200, 200, 900, 700)
         self.setLayoutDirection(Qt.RightToLeft)
@@ -117,33 +123,33 @@ class ImageBlendDialog(QDialog):
     def _apply_operation(self):
         if self.image2 is None:
             return
+        self.scheduler.request(self._combine, self.proxy1.get(self.image1),
+                               self.proxy2.get(self.image2), self.op_combo.currentIndex(),
+                               self.weight_slider.value() / 100.0)
             
-        op = self.op_combo.currentIndex()
+    def _combine(self, img1, img2, op=None, alpha=None):
+        if op is None:
+            op = self.op_combo.currentIndex()
+            alpha = self.weight_slider.value() / 100.0
         
         if op == 0:  # Blend
-            alpha = self.weight_slider.value() / 100.0
-            self.result = self.processor.blend_images(self.image1, self.image2, alpha)
+            return self.processor.blend_images(img1, img2, alpha)
         elif op == 1:  # Add
-            self.result = self.processor.add_images(self.image1, self.image2)
+            return self.processor.add_images(img1, img2)
         elif op == 2:  # AND
-            self.result = self.processor.bitwise_and(self.image1, self.image2)
+            return self.processor.bitwise_and(img1, img2)
         elif op == 3:  # OR
-            self.result = self.processor.bitwise_or(self.image1, self.image2)
+            return self.processor.bitwise_or(img1, img2)
         elif op == 4:  # XOR
-            self.result = self.processor.bitwise_xor(self.image1, self.image2)
-            
-        if self.result is not None:
-            self._show_image(self.result)
+            return self.processor.bitwise_xor(img1, img2)
+        return None
             
     def _show_image(self, image):
         if image is None:
             return
-        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb.shape
-        qimg = QImage(rgb.tobytes(), w, h, ch * w, QImage.Format_RGB888)
-        pixmap = QPixmap.fromImage(qimg)
-        scaled = pixmap.scaled(self.preview.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        self.preview.setPixmap(scaled)
+        show_image(self.preview, image)
         
     def get_result(self):
-        return self.result
+        if self.image2 is None:
+            return None
+        return self._combine(self.image1, self.image2)
@@ -1,10 +1,7 @@
 from PyQt5.QtWidgets import (QMainWindow, QLabel, QVBoxLayout, QHBoxLayout, 
                              QWidget, QFileDialog, QMessageBox, QScrollArea, 
                              QProgressDialog, QTabWidget)
-from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QPixmap, QImage
-import cv2
-import numpy as np
+from PyQt5.QtCore import Qt
 
 from gui.toolbar import Toolbar
 from gui.sidebar import Sidebar
@@ -22,10 +19,14 @@ from gui.layers_panel import LayersPanel
 from gui.color_picker_tool import ColorPickerTool
 from gui.history_panel import HistoryPanel
 from core.image_processor import ImageProcessor
+from core.adjustment_stack import AdjustmentStack
+from core.edit_graph import EditGraph
+from core.preview import PreviewProxy
 from utils.constants import STYLES_PATH
 from utils.file_handler import FileHandler
-from utils.history import History
-from utils.worker import Worker
+from utils.history import AsyncSnapshotStore
+from utils.worker import TaskPool
+from utils.preview_scheduler import PreviewScheduler
 
 
 class MainWindow(QMainWindow):
@@ -36,15 +37,27 @@ class MainWindow(QMainWindow):
         
         self.processor = ImageProcessor()
         self.file_handler = FileHandler()
-        self.history = History(max_size=10)
+        self.document = EditGraph(self.processor, store=AsyncSnapshotStore())
         
         self.current_image = None
         self.original_image = None
         self.base_image = None
+        self.adjusted_image = None
+        self.adjustment_stack = AdjustmentStack()
+        self.preview_proxy = PreviewProxy()
+        self.tasks = TaskPool.instance()
+        self._filter_task = None
+        self.preview_scheduler = PreviewScheduler(self, pool=self.tasks)
+        self.preview_scheduler.ready.connect(self._show_adjustment_preview)
+        self.preview_scheduler.fps_changed.connect(self._show_preview_fps)
         self.current_path = None
         self.camera_win = None
+        self.histogram_win = None
         self.zoom_level = 100
         self.adjusting = False
+        self._adjust_node = None
+        self._adjust_slider = None
+        self._adjust_source = None
         
         self._setup_ui()
         
@@ -139,8 +152,7 @@ class MainWindow(QMainWindow):
                 self.current_image = img
                 self.original_image = img.copy()
                 self.current_path = path
-                self.history.clear()
-                self.history.add_state(img.copy())
+                self.document.reset(img)
                 self.display_image(img)
                 self.info_panel.update_info(img, path)
                 
@@ -156,86 +168,162 @@ class MainWindow(QMainWindow):
                 self.current_path = dialog.output_path
                 self.info_panel.update_info(self.current_image, dialog.output_path)
                 
-    def display_image(self, image):
+    def display_image(self, image, size=None):
         if image is None:
             return
-            
-        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb.shape
-        
-        if self.zoom_level != 100:
-            scale = self.zoom_level / 100.0
-            new_w, new_h = int(w * scale), int(h * scale)
-            rgb = cv2.resize(rgb, (new_w, new_h))
-            h, w = new_h, new_w
-            
-        qimg = QImage(rgb.tobytes(), w, h, ch * w, QImage.Format_RGB888)
-        pixmap = QPixmap.fromImage(qimg)
-        scaled = pixmap.scaled(self.image_label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        self.image_label.setPixmap(scaled)
+        self.image_label.set_image(image, size)
         self.image_label.setStyleSheet("")
+        if size is None and self._histogram_open():
+            self.histogram_win.set_image(image)
+            
+    def _histogram_open(self):
+        return self.histogram_win is not None and self.histogram_win.isVisible()
         
     def apply_filter(self, filter_name, **params):
         if self.current_image is None:
             QMessageBox.warning(self, "Error", "Open an image first")
             return
             
-        self.progress = QProgressDialog("Processing...", None, 0, 0, self)
+        edit = ('apply_filter', dict(filter_name=filter_name, tiled=True, **params))
+        # the same filter on the same image is only computed once
+        key = ('filter', id(self.current_image), filter_name, repr(sorted(params.items())))
+        task = self.tasks.submit(self.processor.apply_filter, self.current_image, filter_name,
+                                 tiled=True, key=key, **params)
+        if task is self._filter_task:
+            return
+        if self._filter_task is not None:
+            self._filter_task.cancel()
+            self.progress.close()
+        self._filter_task = task
+        
+        self.progress = QProgressDialog("Processing...", "Cancel", 0, 0, self)
         self.progress.setWindowModality(Qt.WindowModal)
+        self.progress.canceled.connect(task.cancel)
+        task.finished.connect(lambda result: self._on_filter_done(task, edit, result))
+        task.error.connect(lambda err: self._on_filter_error(task, err))
+        task.cancelled.connect(lambda: self._on_filter_cancelled(task))
         self.progress.show()
         
-        self.worker = Worker(self.processor.apply_filter, self.current_image, filter_name, **params)
-        self.worker.finished.connect(self._on_filter_done)
-        self.worker.error.connect(self._on_filter_error)
-        self.worker.start()
-        
-    def _on_filter_done(self, result):
+    def _end_filter_task(self, task):
+        if task is not self._filter_task:
+            return False
+        self._filter_task = None
         self.progress.close()
-        if result is not None:
-            self.current_image = result
-            self.history.add_state(result.copy())
-            self.display_image(result)
+        return True
+        
+    def _on_filter_done(self, task, edit, result):
+        if self._end_filter_task(task) and result is not None:
+            op, params = edit
+            self.commit_edit(op, params, result)
             
-    def _on_filter_error(self, err):
-        self.progress.close()
-        QMessageBox.critical(self, "Error", f"Processing failed: {err[1]}")
+    def _on_filter_error(self, task, err):
+        if self._end_filter_task(task):
+            QMessageBox.critical(self, "Error", f"Processing failed: {err[1]}")
             
+    def _on_filter_cancelled(self, task):
+        self._end_filter_task(task)
+        
     def start_live_adjustment(self):
         if self.current_image is None:
             return
         if not self.adjusting:
-            self.base_image = self.current_image.copy()
+            # sliders keep rendering from the same base until another edit
+            # replaces current_image, so they combine instead of stacking up
+            if self.base_image is None or self.current_image is not self.adjusted_image:
+                self.base_image = self.current_image.copy()
+                self.adjustment_stack.reset()
+                self._adjust_node = None
+                self._adjust_source = self.document.head
             self.adjusting = True
             
     def preview_adjustment(self, adj_type, value):
         if self.base_image is None or not self.adjusting:
             return
-        result = self.processor.apply_adjustment(self.base_image, adj_type, value)
-        if result is not None:
+        self.adjustment_stack.set(adj_type, value)
+        proxy = self.preview_proxy.get(self.base_image, self.image_label.display_size())
+        # render from a snapshot of the sliders; the stack keeps changing
+        stack = AdjustmentStack(**self.adjustment_stack.values)
+        self.preview_scheduler.request(stack.apply, proxy)
+        
+    def _show_adjustment_preview(self, preview):
+        if self.adjusting and self.base_image is not None:
+            h, w = self.base_image.shape[:2]
+            self.display_image(preview, (w, h))
+            
+    def _show_preview_fps(self, fps):
+        self.statusBar().showMessage(f"Preview: {fps:.1f} fps", 2000)
+            
+    def finish_live_adjustment(self, adj_type=None):
+        if self.adjusting and self.base_image is not None:
+            self.preview_scheduler.cancel()
+            result = self.adjustment_stack.apply(self.base_image)
+            values = dict(self.adjustment_stack.values)
+            if (self._adjust_node is not None and self._adjust_node is self.document.head
+                    and adj_type == self._adjust_slider):
+                # the same slider dragged again: retune its node in place
+                self.document.set_params(self._adjust_node, values, result)
+            else:
+                # one undo step per slider; every node renders all sliders
+                # from the session's base so they combine instead of stacking
+                self._adjust_node = self.document.push('apply_adjustments', values, result,
+                                                       source=self._adjust_source)
+                self._adjust_slider = adj_type
             self.current_image = result
+            self.adjusted_image = result
             self.display_image(result)
-            
-    def finish_live_adjustment(self):
-        if self.adjusting and self.current_image is not None:
-            self.history.add_state(self.current_image.copy())
-            self.base_image = None
             self.adjusting = False
             
     def reset_to_base_image(self):
         if self.base_image is not None:
+            self.preview_scheduler.cancel()
+            changed = not self.adjusting and not self.adjustment_stack.is_identity()
             self.current_image = self.base_image.copy()
             self.display_image(self.current_image)
+            if changed:
+                self.document.push_raster(self.current_image)
             self.base_image = None
+            self.adjusted_image = None
+            self._adjust_node = None
+            self._adjust_source = None
+            self.adjustment_stack.reset()
+            self.preview_proxy.invalidate()
             self.adjusting = False
             
+    def commit_edit(self, op, params, result):
+        """Record an ImageProcessor operation that has already been rendered."""
+        self.document.push(op, params, result)
+        self.current_image = result
+        self.display_image(result)
+        
+    def commit_image(self, image, rect=None):
+        """Record a pixel edit that can't be replayed from parameters.
+        
+        `rect` = (x1, y1, x2, y2) is the area the edit touched, if known; only
+        that part of the display and histogram is then recomputed.
+        """
+        self.document.push_raster(image)
+        previous = self.current_image
+        self.current_image = image
+        if rect is None or previous is None or previous.shape != image.shape:
+            self.display_image(image)
+            return
+        # shapes near an edge report rects past it; negative slice starts
+        # would wrap around
+        h, w = image.shape[:2]
+        x1, y1, x2, y2 = rect
+        rect = (max(0, x1), max(0, y1), min(w, x2), min(h, y2))
+        self.image_label.update_region(image, rect)
+        if self._histogram_open():
+            self.histogram_win.update_region(previous, image, rect)
+        
     def undo(self):
-        prev = self.history.undo()
+        prev = self.document.undo()
         if prev is not None:
             self.current_image = prev
             self.display_image(prev)
             
     def redo(self):
-        next_state = self.history.redo()
+        next_state = self.document.redo()
         if next_state is not None:
             self.current_image = next_state
             self.display_image(next_state)
@@ -248,24 +336,21 @@ class MainWindow(QMainWindow):
     def set_camera_image(self, image):
         self.current_image = image
         self.original_image = image.copy()
-        self.history.clear()
-        self.history.add_state(image.copy())
+        self.document.reset(image)
         self.display_image(image)
         self.info_panel.update_info(image)
         
     def rotate_image(self, angle):
         if self.current_image is None:
             return
-        self.current_image = self.processor.rotate(self.current_image, angle)
-        self.history.add_state(self.current_image.copy())
-        self.display_image(self.current_image)
+        result = self.processor.rotate(self.current_image, angle)
+        self.commit_edit('rotate', {'angle': angle}, result)
         
     def flip_image(self, direction):
         if self.current_image is None:
             return
-        self.current_image = self.processor.flip(self.current_image, direction)
-        self.history.add_state(self.current_image.copy())
-        self.display_image(self.current_image)
+        result = self.processor.flip(self.current_image, direction)
+        self.commit_edit('flip', {'direction': direction}, result)
         
     def crop_image(self):
         if self.current_image is None:
@@ -275,9 +360,9 @@ class MainWindow(QMainWindow):
         if dialog.exec_():
             cropped = dialog.get_cropped_image()
             if cropped is not None:
-                self.current_image = cropped
-                self.history.add_state(cropped.copy())
-                self.display_image(cropped)
+                h, w = cropped.shape[:2]
+                self.commit_edit('crop', {'x': dialog.crop_x, 'y': dialog.crop_y, 'w': w, 'h': h},
+                                 cropped)
                 
     def resize_image(self):
         if self.current_image is None:
@@ -287,16 +372,14 @@ class MainWindow(QMainWindow):
         if dialog.exec_():
             resized = dialog.get_resized_image()
             if resized is not None:
-                self.current_image = resized
-                self.history.add_state(resized.copy())
-                self.display_image(resized)
+                self.commit_image(resized)
                 
     def show_histogram(self):
         if self.current_image is None:
             QMessageBox.warning(self, "Error", "Open an image first")
             return
-        win = HistogramWindow(self.current_image, self)
-        win.show()
+        self.histogram_win = HistogramWindow(self.current_image, self)
+        self.histogram_win.show()
         
     def open_batch_processing(self):
         from gui.batch_processing_dialog import BatchProcessingDialog
@@ -313,8 +396,7 @@ class MainWindow(QMainWindow):
     def _on_zoom(self, level):
         self.zoom_level = level
         self.info_panel.update_zoom(level)
-        if self.current_image is not None:
-            self.display_image(self.current_image)
+        self.image_label.set_zoom(level)
     
     def open_face_detection(self):
         if self.current_image is None:
@@ -327,9 +409,7 @@ class MainWindow(QMainWindow):
         if dialog.exec_():
             result = dialog.get_processed_image()
             if result is not None:
-                self.current_image = result
-                self.history.add_state(result.copy())
-                self.display_image(result)
+                self.commit_image(result)
     
     def open_blend_dialog(self):
         if self.current_image is None:
@@ -342,9 +422,7 @@ class MainWindow(QMainWindow):
         if dialog.exec_():
             result = dialog.get_result()
             if result is not None:
-                self.current_image = result
-                self.history.add_state(result.copy())
-                self.display_image(result)
+                self.commit_image(result)
     
     def open_split_view(self):
         if self.current_image is None:
@@ -357,9 +435,7 @@ class MainWindow(QMainWindow):
         if dialog.exec_():
             result = dialog.get_result()
             if result is not None:
-                self.current_image = result
-                self.history.add_state(result.copy())
-                self.display_image(result)
+                self.commit_image(result)
     
     def open_rotate_dialog(self):
         if self.current_image is None:
@@ -372,9 +448,8 @@ class MainWindow(QMainWindow):
         if dialog.exec_():
             result = dialog.get_result()
             if result is not None:
-                self.current_image = result
-                self.history.add_state(result.copy())
-                self.display_image(result)
+                op, params = dialog.get_operation()
+                self.commit_edit(op, params, result)
     
     def open_shape_generator(self):
         from gui.shape_generator_dialog import ShapeGeneratorDialog
@@ -385,8 +460,7 @@ class MainWindow(QMainWindow):
             if result is not None:
                 self.current_image = result
                 self.original_image = result.copy()
-                self.history.clear()
-                self.history.add_state(result.copy())
+                self.document.reset(result)
                 self.display_image(result)
                 self.info_panel.update_info(result)
     
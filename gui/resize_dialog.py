@@ -1,9 +1,12 @@
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton, 
                              QLabel, QSpinBox, QCheckBox, QGroupBox)
 from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QPixmap, QImage
 import cv2
 
+from core.preview import PreviewProxy
+from utils.display import show_image
+from utils.preview_scheduler import PreviewScheduler
+
 
 class ResizeDialog(QDialog):
     MAX_DIMENSION = 8000
@@ -11,6 +14,9 @@ class ResizeDialog(QDialog):
     def __init__(self, image, parent=None):
         super().__init__(parent)
         self.image = image
+        self.proxy = PreviewProxy()
+        self.scheduler = PreviewScheduler(self)
+        self.scheduler.ready.connect(self._show_image)
         self.setWindowTitle("Resize Image")
         self.setGeometry(200, 200, 600, 500)
         
@@ -93,13 +99,16 @@ class ResizeDialog(QDialog):
         new_w = self.w_spin.value()
         new_h = self.h_spin.value()
         
-        resized = cv2.resize(self.image, (new_w, new_h))
-        rgb = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb.shape
-        qimg = QImage(rgb.tobytes(), w, h, ch * w, QImage.Format_RGB888)
-        pixmap = QPixmap.fromImage(qimg)
-        scaled = pixmap.scaled(self.preview.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        self.preview.setPixmap(scaled)
+        # resample the proxy instead of the full image; small targets still
+        # come out at their real size so the preview shows their pixelation
+        proxy = self.proxy.get(self.image)
+        ph, pw = proxy.shape[:2]
+        scale = min(1.0, pw / new_w, ph / new_h)
+        size = (max(1, int(new_w * scale)), max(1, int(new_h * scale)))
+        self.scheduler.request(cv2.resize, proxy, size)
+        
+    def _show_image(self, image):
+        show_image(self.preview, image)
         
     def get_resized_image(self):
         new_w = self.w_spin.value()
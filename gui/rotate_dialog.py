@@ -1,8 +1,10 @@
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton,
                              QLabel, QSlider, QGroupBox, QSpinBox)
 from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QPixmap, QImage
-import cv2
+
+from core.preview import PreviewProxy
+from utils.display import show_image
+from utils.preview_scheduler import PreviewScheduler
 
 
 class RotateDialog(QDialog):
@@ -10,7 +12,9 @@ class RotateDialog(QDialog):
         super().__init__(parent)
         self.image = image
         self.processor = processor
-        self.result = None
+        self.proxy = PreviewProxy()
+        self.scheduler = PreviewScheduler(self)
+        self.scheduler.ready.connect(self._show_image)
         self.setWindowTitle("چرخش تصویر")
         self.setGeometry(200, 200, 800, 650)
         self.setLayoutDirection(Qt.RightToLeft)
@@ -96,24 +100,27 @@ class RotateDialog(QDialog):
         self._update_preview()
         
     def _update_preview(self):
-        angle = self.angle_spin.value()
+        self.scheduler.request(self._rotate, self.proxy.get(self.image), self.angle_spin.value())
+        
+    def _rotate(self, image, angle=None):
+        if angle is None:
+            angle = self.angle_spin.value()
         if angle == 0:
-            self.result = self.image.copy()
+            return image.copy()
         elif angle in [90, -90, 180]:
-            self.result = self.processor.rotate(self.image, angle)
-        else:
-            self.result = self.processor.rotate_free(self.image, angle)
-        self._show_image(self.result)
+            return self.processor.rotate(image, angle)
+        return self.processor.rotate_free(image, angle)
         
     def _show_image(self, image):
         if image is None:
             return
-        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb.shape
-        qimg = QImage(rgb.tobytes(), w, h, ch * w, QImage.Format_RGB888)
-        pixmap = QPixmap.fromImage(qimg)
-        scaled = pixmap.scaled(self.preview.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        self.preview.setPixmap(scaled)
+        show_image(self.preview, image)
         
     def get_result(self):
-        return self.result
+        return self._rotate(self.image)
+        
+    def get_operation(self):
+        angle = self.angle_spin.value()
+        if angle in [0, 90, -90, 180]:
+            return 'rotate', {'angle': angle}
+        return 'rotate_free', {'angle': angle}
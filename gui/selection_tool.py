@@ -1,6 +1,6 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
                              QLabel, QGroupBox, QComboBox, QMessageBox, QColorDialog)
-from PyQt5.QtCore import Qt, QRect, pyqtSignal
+from PyQt5.QtCore import Qt, QRect, QPoint, pyqtSignal
 import cv2
 
 
@@ -202,18 +202,14 @@ class SelectionTool(QWidget):
             return None
             
         rect = self.state.rect
-        label = self.parent_window.image_label
+        canvas = self.parent_window.image_label
         img = self.parent_window.current_image
         img_h, img_w = img.shape[:2]
         
-        scale_w = img_w / label.size().width()
-        scale_h = img_h / label.size().height()
-        scale = max(scale_w, scale_h)
-        
-        x1 = max(0, min(int(rect.x() * scale), img_w))
-        y1 = max(0, min(int(rect.y() * scale), img_h))
-        x2 = max(0, min(int((rect.x() + rect.width()) * scale), img_w))
-        y2 = max(0, min(int((rect.y() + rect.height()) * scale), img_h))
+        x1, y1 = canvas.map_to_image(rect.topLeft())
+        x2, y2 = canvas.map_to_image(rect.topLeft() + QPoint(rect.width(), rect.height()))
+        x1, x2 = max(0, min(x1, img_w)), max(0, min(x2, img_w))
+        y1, y2 = max(0, min(y1, img_h)), max(0, min(y2, img_h))
         
         if x2 <= x1 or y2 <= y1:
             QMessageBox.warning(self, "خطا", "ناحیه انتخابی نامعتبر است")
@@ -227,9 +223,8 @@ class SelectionTool(QWidget):
             x1, y1, x2, y2 = coords
             cropped = self.parent_window.current_image[y1:y2, x1:x2]
             if cropped.size > 0:
-                self.parent_window.current_image = cropped
-                self.parent_window.history.add_state(cropped.copy())
-                self.parent_window.display_image(cropped)
+                h, w = cropped.shape[:2]
+                self.parent_window.commit_edit('crop', {'x': x1, 'y': y1, 'w': w, 'h': h}, cropped)
                 self.parent_window.info_panel.update_info(cropped)
                 self._clear()
             
@@ -249,9 +244,7 @@ class SelectionTool(QWidget):
                 bgr = (color.blue(), color.green(), color.red())
                 img = self.parent_window.current_image.copy()
                 img[y1:y2, x1:x2] = bgr
-                self.parent_window.current_image = img
-                self.parent_window.history.add_state(img.copy())
-                self.parent_window.display_image(img)
+                self.parent_window.commit_image(img, coords)
                 self._clear()
                 
     def _blur(self):
@@ -262,9 +255,7 @@ class SelectionTool(QWidget):
             region = img[y1:y2, x1:x2]
             blurred = cv2.GaussianBlur(region, (21, 21), 0)
             img[y1:y2, x1:x2] = blurred
-            self.parent_window.current_image = img
-            self.parent_window.history.add_state(img.copy())
-            self.parent_window.display_image(img)
+            self.parent_window.commit_image(img, coords)
             self._clear()
             
     def _invert(self):
@@ -274,14 +265,15 @@ class SelectionTool(QWidget):
             img = self.parent_window.current_image.copy()
             region = img[y1:y2, x1:x2]
             img[y1:y2, x1:x2] = cv2.bitwise_not(region)
-            self.parent_window.current_image = img
-            self.parent_window.history.add_state(img.copy())
-            self.parent_window.display_image(img)
+            self.parent_window.commit_image(img, coords)
             self._clear()
             
     def _clear(self):
         self.state.clear()
         self.info_label.setText("انتخاب: -")
+        if self.parent_window is not None:
+            self.parent_window.image_label.selection_preview = None
+            self.parent_window.image_label.update()
         if self.sel_btn.isChecked():
             self.sel_btn.setChecked(False)
             self._toggle_mode(False)
@@ -1,9 +1,9 @@
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton,
                              QLabel, QSpinBox, QGroupBox, QComboBox, QColorDialog)
 from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QPixmap, QImage
 import cv2
 import numpy as np
+from utils.display import show_image
 
 
 class ShapeGeneratorDialog(QDialog):
@@ -197,12 +197,7 @@ class ShapeGeneratorDialog(QDialog):
     def _show_image(self, image):
         if image is None:
             return
-        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb.shape
-        qimg = QImage(rgb.tobytes(), w, h, ch * w, QImage.Format_RGB888)
-        pixmap = QPixmap.fromImage(qimg)
-        scaled = pixmap.scaled(self.preview.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        self.preview.setPixmap(scaled)
+        show_image(self.preview, image)
         
     def get_result(self):
         return self.result
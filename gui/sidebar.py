@@ -284,7 +284,7 @@ class Sidebar(QWidget):
         self.main.preview_adjustment(adj_type, value)
         
     def _finish_adj(self, adj_type):
-        self.main.finish_live_adjustment()
+        self.main.finish_live_adjustment(adj_type)
         
     def _reset_adj(self):
         for slider, label, name in [
@@ -1,16 +1,21 @@
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton,
                              QLabel, QSlider, QGroupBox, QRadioButton, QButtonGroup)
 from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QPixmap, QImage
 import cv2
 import numpy as np
 
+from core.preview import PreviewProxy
+from utils.display import show_image
+from utils.preview_scheduler import PreviewScheduler
+
 
 class SplitViewDialog(QDialog):
     def __init__(self, image, parent=None):
         super().__init__(parent)
         self.image = image
-        self.result = None
+        self.proxy = PreviewProxy()
+        self.scheduler = PreviewScheduler(self)
+        self.scheduler.ready.connect(self._show_image)
         self.setWindowTitle("نمایش همزمان رنگی و خاکستری")
         self.setGeometry(200, 200, 900, 700)
         self.setLayoutDirection(Qt.RightToLeft)
@@ -92,39 +97,34 @@ class SplitViewDialog(QDialog):
         
     def _update_preview(self):
         mode = self.mode_group.checkedId()
-        pos = self.pos_slider.value()
+        self.pos_slider.setEnabled(mode == 0)
+        self.scheduler.request(self._split, self.proxy.get(self.image), mode,
+                               self.pos_slider.value())
         
-        gray = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
+    def _split(self, image, mode, pos):
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         gray_bgr = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
         
-        h, w = self.image.shape[:2]
+        h, w = image.shape[:2]
         
         if mode == 0:  # تقسیم عمودی
             split_x = int(w * pos / 100)
-            self.result = self.image.copy()
-            self.result[:, split_x:] = gray_bgr[:, split_x:]
-            cv2.line(self.result, (split_x, 0), (split_x, h), (0, 255, 0), 2)
-            self.pos_slider.setEnabled(True)
+            result = image.copy()
+            result[:, split_x:] = gray_bgr[:, split_x:]
+            cv2.line(result, (split_x, 0), (split_x, h), (0, 255, 0), 2)
+            return result
             
         elif mode == 1:  # کنار هم
-            self.result = np.hstack([self.image, gray_bgr])
-            self.pos_slider.setEnabled(False)
+            return np.hstack([image, gray_bgr])
             
         elif mode == 2:  # بالا و پایین
-            self.result = np.vstack([self.image, gray_bgr])
-            self.pos_slider.setEnabled(False)
-            
-        self._show_image(self.result)
+            return np.vstack([image, gray_bgr])
+        return None
         
     def _show_image(self, image):
         if image is None:
             return
-        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb.shape
-        qimg = QImage(rgb.tobytes(), w, h, ch * w, QImage.Format_RGB888)
-        pixmap = QPixmap.fromImage(qimg)
-        scaled = pixmap.scaled(self.preview.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        self.preview.setPixmap(scaled)
+        show_image(self.preview, image)
         
     def get_result(self):
-        return self.result
+        return self._split(self.image, self.mode_group.checkedId(), self.pos_slider.value())
@@ -2,8 +2,8 @@ from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton,
                              QLabel, QSlider, QGroupBox, QFileDialog, QComboBox,
                              QCheckBox, QProgressBar, QMessageBox)
 from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QPixmap, QImage
 import cv2
+from utils.display import show_image
 
 
 class VideoProcessorDialog(QDialog):
@@ -18,6 +18,7 @@ class VideoProcessorDialog(QDialog):
         self.current_pos = 0
         self.grayscale = False
         self.filter_name = None
+        self.chain = processor.compile_chain([])
         
         self.setWindowTitle("پردازش ویدیو")
         self.setGeometry(200, 200, 900, 700)
@@ -89,7 +90,7 @@ class VideoProcessorDialog(QDialog):
         proc_lay = QVBoxLayout()
         
         self.gray_chk = QCheckBox("🎞️ تبدیل به خاکستری")
-        self.gray_chk.stateChanged.connect(lambda s: setattr(self, 'grayscale', s == Qt.Checked))
+        self.gray_chk.stateChanged.connect(self._on_gray_change)
         proc_lay.addWidget(self.gray_chk)
         
         filter_lay = QHBoxLayout()
@@ -155,6 +156,20 @@ class VideoProcessorDialog(QDialog):
     def _on_filter_change(self, idx):
         filters = [None, 'blur', 'sharpen', 'edge', 'grayscale', 'invert', 'cartoon']
         self.filter_name = filters[idx] if idx > 0 else None
+        self._compile_chain()
+        
+    def _on_gray_change(self, state):
+        self.grayscale = state == Qt.Checked
+        self._compile_chain()
+        
+    def _compile_chain(self):
+        # compiled once per settings change, not per frame
+        steps = []
+        if self.grayscale:
+            steps.append('grayscale')
+        if self.filter_name:
+            steps.append(self.filter_name)
+        self.chain = self.processor.compile_chain(steps)
         
     def _toggle_play(self):
         if self.cap is None:
@@ -209,22 +224,10 @@ class VideoProcessorDialog(QDialog):
             self.time_label.setText(f"{cur_m:02d}:{cur_s:02d} / {tot_m:02d}:{tot_s:02d}")
         
         # پردازش
-        processed = frame.copy()
-        
-        if self.grayscale:
-            processed = cv2.cvtColor(processed, cv2.COLOR_BGR2GRAY)
-            processed = cv2.cvtColor(processed, cv2.COLOR_GRAY2BGR)
-            
-        if self.filter_name:
-            processed = self.processor.apply_filter(processed, self.filter_name)
+        processed = self.chain.apply(frame)
         
         # نمایش
-        rgb = cv2.cvtColor(processed, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb.shape
-        qimg = QImage(rgb.tobytes(), w, h, ch * w, QImage.Format_RGB888)
-        pixmap = QPixmap.fromImage(qimg)
-        scaled = pixmap.scaled(self.display.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        self.display.setPixmap(scaled)
+        show_image(self.display, processed)
         
     def _capture_frame(self):
         if self.current_frame is None:
@@ -234,12 +237,7 @@ class VideoProcessorDialog(QDialog):
             self, "ذخیره فریم", "", "Images (*.png *.jpg)"
         )
         if path:
-            frame = self.current_frame.copy()
-            if self.grayscale:
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
-            if self.filter_name:
-                frame = self.processor.apply_filter(frame, self.filter_name)
+            frame = self.chain.apply(self.current_frame)
             cv2.imwrite(path, frame)
             QMessageBox.information(self, "موفق", "فریم ذخیره شد")
             
@@ -3,12 +3,23 @@ Photo Editor - Professional Image Editing Application
 Copyright (c) 2024 D-speedster (github.com/D-speedster)
 Licensed under MIT License
 """
+import multiprocessing
 import sys
-from PyQt5.QtWidgets import QApplication
-from gui.main_window import MainWindow
 
 
 def main():
+    # in the frozen exe, batch pool workers start here; this runs them
+    # instead of opening another window
+    multiprocessing.freeze_support()
+    
+    # `main.py batch ...` runs headless and never loads Qt
+    if len(sys.argv) > 1 and sys.argv[1] == 'batch':
+        from cli import main as cli_main
+        sys.exit(cli_main(sys.argv[1:]))
+    
+    from PyQt5.QtWidgets import QApplication
+    from gui.main_window import MainWindow
+    
     app = QApplication(sys.argv)
     app.setApplicationName("Photo Editor")
     app.setStyle('Fusion')
@@ -0,0 +1,65 @@
+"""
+Display - Shared numpy → QImage/QPixmap conversion for every view
+Copyright (c) 2024 D-speedster (github.com/D-speedster)
+"""
+import cv2
+import numpy as np
+from PyQt5.QtGui import QImage, QPixmap
+
+
+def _box(size):
+    if hasattr(size, 'width'):
+        return size.width(), size.height()
+    return size
+
+
+def fit_image(image, size, upscale=True):
+    """Resize `image` once to the largest size that fits `size` (QSize or
+    (w, h)) keeping the aspect ratio. Shrinking uses INTER_AREA."""
+    bw, bh = _box(size)
+    h, w = image.shape[:2]
+    if bw <= 0 or bh <= 0 or w == 0 or h == 0:
+        return image
+    scale = min(bw / w, bh / h)
+    if scale >= 1.0 and not upscale:
+        return image
+    new_w, new_h = max(1, int(round(w * scale))), max(1, int(round(h * scale)))
+    if (new_w, new_h) == (w, h):
+        return image
+    interp = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+    return cv2.resize(image, (new_w, new_h), interpolation=interp)
+
+
+def to_qimage(image):
+    """Wrap a uint8 BGR, BGRA or grayscale array as a QImage without copying.
+
+    The QImage points straight at the array's memory; the array is kept
+    alive on the QImage for as long as it exists.
+    """
+    if image.dtype != np.uint8:
+        image = cv2.convertScaleAbs(image)
+    if not image.flags.c_contiguous:
+        image = np.ascontiguousarray(image)
+    h, w = image.shape[:2]
+    if image.ndim == 2:
+        fmt = QImage.Format_Grayscale8
+    elif image.shape[2] == 4:
+        fmt = QImage.Format_ARGB32
+    else:
+        fmt = QImage.Format_BGR888
+    qimg = QImage(image.data, w, h, image.strides[0], fmt)
+    qimg._array = image
+    return qimg
+
+
+def to_pixmap(image, size=None):
+    if size is not None:
+        image = fit_image(image, size)
+    return QPixmap.fromImage(to_qimage(image))
+
+
+def show_image(label, image, size=None):
+    """Fit `image` to `label` (or `size`) and show it."""
+    if image is None:
+        return
+    label.setPixmap(to_pixmap(image, size if size is not None else label.size()))
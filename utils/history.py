@@ -1,79 +1,347 @@
 """
-History - Undo/Redo functionality with temp file storage
+History - Undo/Redo functionality with compressed in-memory storage
 Copyright (c) 2024 D-speedster (github.com/D-speedster)
 """
-import cv2
 import tempfile
 import os
 import shutil
 import atexit
+import zlib
+import hashlib
+import queue
+import threading
+from collections import OrderedDict
+from itertools import count
+
+import numpy as np
+
+try:
+    import lz4.frame as lz4
+except ImportError:
+    lz4 = None
+
+
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+TILE_SIZE = 256
+
+
+def available_codecs():
+    codecs = ['none', 'zlib']
+    if lz4 is not None:
+        codecs.append('lz4')
+    return codecs
+
+
+def _delta_encode(image):
+    out = np.array(image, copy=True, order='C')
+    if image.ndim > 1 and image.shape[1] > 1:
+        np.subtract(image[:, 1:], image[:, :-1], out=out[:, 1:])
+    return out
+
+
+def _delta_decode(delta):
+    if delta.ndim > 1:
+        return np.cumsum(delta, axis=1, dtype=delta.dtype)
+    return delta.copy()
+
+
+class SnapshotStore:
+    """Keyed storage for image snapshots.
+
+    Every snapshot is cut into `tile_size` tiles that are stored by content
+    hash and reference-counted, so a state that differs from the previous
+    one by a brush stroke only adds the handful of tiles the stroke
+    touched; everything else is shared.
+
+    Tiles are stored as horizontal pixel differences (PNG's "sub" filter,
+    which is what makes photos compressible) and compressed in memory with
+    zlib's run-length strategy, or lz4 when installed; `level` trades speed
+    for size. When the compressed total grows past `memory_budget` the
+    least recently referenced tiles are written as-is to a temp directory
+    and read back on demand, so nothing is ever re-encoded as PNG.
+    `stored_bytes` counts every tile, in memory or spilled.
+
+    The last reconstructed state is kept decoded, so stepping through
+    neighbouring states only decompresses the tiles that differ.
+    """
+
+    def __init__(self, codec='zlib', level=1, memory_budget=DEFAULT_MEMORY_BUDGET,
+                 tile_size=TILE_SIZE):
+        if codec not in available_codecs():
+            raise ValueError(f"Unknown or unavailable codec: {codec}")
+        self.codec = codec
+        self.level = level
+        self.memory_budget = memory_budget
+        self.tile_size = tile_size
+        self.memory_bytes = 0
+        self.spilled_bytes = 0
+        self.temp_dir = None
+        self._states = {}               # key -> (shape, dtype, [tile ids])
+        self._tiles = OrderedDict()     # tile id -> [blob or None, path or None, refs, shape, size]
+        self._ids = count()
+        self._last = None               # (shape, dtype, [tile ids], image) of the last get
+
+    def put(self, image):
+        ts = self.tile_size
+        h, w = image.shape[:2]
+        tile_ids = []
+        for y in range(0, h, ts):
+            for x in range(0, w, ts):
+                tile = np.ascontiguousarray(image[y:y + ts, x:x + ts])
+                tid = (hashlib.sha1(tile.data).digest(), tile.shape)
+                entry = self._tiles.get(tid)
+                if entry is None:
+                    blob = self._compress(_delta_encode(tile).data)
+                    self._tiles[tid] = [blob, None, 1, tile.shape, len(blob)]
+                    self.memory_bytes += len(blob)
+                else:
+                    entry[2] += 1
+                    self._tiles.move_to_end(tid)
+                tile_ids.append(tid)
+
+        key = next(self._ids)
+        self._states[key] = (image.shape, image.dtype, tile_ids)
+        self._spill()
+        return key
+
+    def get(self, key):
+        state = self._states.get(key)
+        if state is None:
+            return None
+        shape, dtype, tile_ids = state
+        ts = self.tile_size
+        last = self._last
+        if last is not None and last[0] == shape and last[1] == dtype:
+            out, known = last[3].copy(), last[2]
+        else:
+            out, known = np.empty(shape, dtype=dtype), [None] * len(tile_ids)
+        tiles = iter(zip(tile_ids, known))
+        try:
+            for y in range(0, shape[0], ts):
+                for x in range(0, shape[1], ts):
+                    tid, old = next(tiles)
+                    if tid == old:
+                        continue
+                    blob, path, _, tshape, _ = self._tiles[tid]
+                    if blob is None:
+                        with open(path, 'rb') as f:
+                            blob = f.read()
+                    raw = self._decompress(blob)
+                    out[y:y + ts, x:x + ts] = _delta_decode(
+                        np.frombuffer(raw, dtype=dtype).reshape(tshape))
+        except Exception:
+            return None
+        self._last = (shape, dtype, tile_ids, out)
+        return out.copy()
+
+    def remove(self, keys):
+        for key in keys:
+            state = self._states.pop(key, None)
+            if state is None:
+                continue
+            for tid in state[2]:
+                entry = self._tiles.get(tid)
+                if entry is None:
+                    continue
+                entry[2] -= 1
+                if entry[2] > 0:
+                    continue
+                del self._tiles[tid]
+                if entry[0] is not None:
+                    self.memory_bytes -= len(entry[0])
+                if entry[1] is not None:
+                    self.spilled_bytes -= entry[4]
+                    try:
+                        os.remove(entry[1])
+                    except Exception:
+                        pass
+
+    @property
+    def stored_bytes(self):
+        return self.memory_bytes + self.spilled_bytes
+
+    def clear(self):
+        self.remove(list(self._states))
+        self._last = None
+
+    def _compress(self, data):
+        if self.codec == 'lz4':
+            return lz4.compress(data, compression_level=self.level)
+        if self.codec == 'zlib':
+            c = zlib.compressobj(self.level, zlib.DEFLATED, 15, 9, zlib.Z_RLE)
+            return c.compress(data) + c.flush()
+        return bytes(data)
+
+    def _decompress(self, blob):
+        if self.codec == 'lz4':
+            return lz4.decompress(blob)
+        if self.codec == 'zlib':
+            return zlib.decompress(blob)
+        return blob
+
+    def _spill(self):
+        for entry in self._tiles.values():
+            if self.memory_bytes <= self.memory_budget:
+                break
+            if entry[0] is None:
+                continue
+            try:
+                fd, path = tempfile.mkstemp(suffix='.bin', dir=self._spill_dir())
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(entry[0])
+            except Exception:
+                break
+            self.memory_bytes -= entry[4]
+            self.spilled_bytes += entry[4]
+            entry[0], entry[1] = None, path
+
+    def _spill_dir(self):
+        if self.temp_dir is None:
+            self.temp_dir = tempfile.mkdtemp(prefix="pe_hist_")
+            atexit.register(self._cleanup_all)
+        return self.temp_dir
+
+    def _cleanup_all(self):
+        try:
+            if self.temp_dir and os.path.exists(self.temp_dir):
+                shutil.rmtree(self.temp_dir, ignore_errors=True)
+        except Exception:
+            pass
+
+    def __del__(self):
+        self._cleanup_all()
+
+
+class AsyncSnapshotStore:
+    """Runs `put` on a background writer thread.
+
+    `put` does not copy: the array is frozen (made read-only) and handed to
+    the writer as is, so anyone who wants to keep editing it has to copy,
+    which every edit path already does. At most `max_pending` snapshots
+    wait in the queue; beyond that `put` blocks until the writer catches
+    up. `get` on a snapshot that is still queued returns a copy of the
+    in-flight frame; otherwise it only waits for the store if the writer
+    is busy with it at that moment.
+    """
+
+    def __init__(self, store=None, max_pending=4):
+        self.store = store or SnapshotStore()
+        self._lock = threading.Lock()          # bookkeeping below, held briefly
+        self._store_lock = threading.Lock()    # self.store; taken before _lock
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._pending = {}      # key -> frozen image not yet written
+        self._written = {}      # key -> key in self.store
+        self._dropped = set()   # keys removed while still pending
+        self._ids = count()
+        self._thread = threading.Thread(target=self._run, name="pe_history", daemon=True)
+        self._thread.start()
+
+    def put(self, image):
+        image.flags.writeable = False
+        key = next(self._ids)
+        with self._lock:
+            self._pending[key] = image
+        self._queue.put((key, image))
+        return key
+
+    def get(self, key):
+        with self._lock:
+            image = self._pending.get(key)
+            inner = self._written.get(key)
+        if image is not None:
+            return image.copy()
+        if inner is None:
+            return None
+        with self._store_lock:
+            return self.store.get(inner)
+
+    def remove(self, keys):
+        inner = []
+        with self._lock:
+            for key in keys:
+                if key in self._pending:
+                    self._dropped.add(key)
+                elif key in self._written:
+                    inner.append(self._written.pop(key))
+        with self._store_lock:
+            self.store.remove(inner)
+
+    def clear(self):
+        with self._lock:
+            self._dropped.update(self._pending)
+            self._written.clear()
+        with self._store_lock:
+            self.store.clear()
+
+    @property
+    def stored_bytes(self):
+        """Bytes held by the inner store; snapshots still queued are not
+        counted yet."""
+        return self.store.stored_bytes
+
+    def flush(self):
+        """Block until every queued snapshot has been written."""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            key, image = self._queue.get()
+            try:
+                with self._store_lock:
+                    inner = self.store.put(image)
+                    with self._lock:
+                        self._pending.pop(key, None)
+                        dropped = key in self._dropped
+                        self._dropped.discard(key)
+                        if not dropped:
+                            self._written[key] = inner
+                    if dropped:
+                        self.store.remove([inner])
+            except Exception:
+                with self._lock:
+                    self._pending.pop(key, None)
+                    self._dropped.discard(key)
+            finally:
+                self._queue.task_done()
 
 
 class History:
-    def __init__(self, max_size=10):
+    def __init__(self, max_size=None, store=None, async_mode=False, **store_options):
         self.states = []
         self.current_index = -1
         self.max_size = max_size
-        self.temp_dir = tempfile.mkdtemp(prefix="pe_hist_")
-        atexit.register(self._cleanup_all)
-        
+        self.store = store or SnapshotStore(**store_options)
+        if async_mode:
+            self.store = AsyncSnapshotStore(self.store)
+
     def add_state(self, image):
-        self._remove_files(self.states[self.current_index + 1:])
+        self.store.remove(self.states[self.current_index + 1:])
         self.states = self.states[:self.current_index + 1]
-        
+
         try:
-            fd, path = tempfile.mkstemp(suffix='.png', dir=self.temp_dir)
-            os.close(fd)
-            cv2.imwrite(path, image)
-            self.states.append(path)
+            self.states.append(self.store.put(image))
             self.current_index += 1
-            
-            if len(self.states) > self.max_size:
+
+            if self.max_size and len(self.states) > self.max_size:
                 old = self.states.pop(0)
-                self._remove_files([old])
+                self.store.remove([old])
                 self.current_index -= 1
         except Exception:
             pass
-            
+
     def undo(self):
         if self.current_index > 0:
             self.current_index -= 1
-            return self._load(self.states[self.current_index])
+            return self.store.get(self.states[self.current_index])
         return None
-        
+
     def redo(self):
         if self.current_index < len(self.states) - 1:
             self.current_index += 1
-            return self._load(self.states[self.current_index])
+            return self.store.get(self.states[self.current_index])
         return None
-        
+
     def clear(self):
-        self._remove_files(self.states)
+        self.store.remove(self.states)
         self.states = []
         self.current_index = -1
-        
-    def _load(self, path):
-        try:
-            if os.path.exists(path):
-                return cv2.imread(path)
-        except Exception:
-            pass
-        return None
-        
-    def _remove_files(self, paths):
-        for p in paths:
-            try:
-                if os.path.exists(p):
-                    os.remove(p)
-            except Exception:
-                pass
-                
-    def _cleanup_all(self):
-        try:
-            if os.path.exists(self.temp_dir):
-                shutil.rmtree(self.temp_dir, ignore_errors=True)
-        except Exception:
-            pass
-            
-    def __del__(self):
-        self._cleanup_all()
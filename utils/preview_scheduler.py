@@ -0,0 +1,95 @@
+"""
+Preview Scheduler - Coalesced, off-thread rendering for live previews
+Copyright (c) 2024 D-speedster (github.com/D-speedster)
+"""
+import threading
+import time
+from collections import deque
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from utils.worker import TaskPool, LANE_INTERACTIVE
+
+
+class PreviewScheduler(QObject):
+    """Runs at most one preview render at a time on the interactive lane of
+    a TaskPool (the shared one unless `pool` is given).
+
+    While a render is running, new requests only replace the pending one
+    (latest value wins), so a slider drag never builds a backlog and the
+    requests in between are never rendered. Results arrive through `ready`
+    on the UI thread, newest first; anything requested before `cancel()`
+    is dropped. `fps` is the rate of delivered previews over the last
+    `window` seconds.
+    """
+    ready = pyqtSignal(object)
+    fps_changed = pyqtSignal(float)
+    _finished = pyqtSignal(int, object)
+
+    def __init__(self, parent=None, window=1.0, pool=None):
+        super().__init__(parent)
+        self.window = window
+        self.fps = 0.0
+        self._pool = pool or TaskPool.instance()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._floor = 0          # jobs up to this generation were cancelled
+        self._shown = 0
+        self._pending = None
+        self._running = False
+        self._times = deque()
+        # queued onto the UI thread, where cancel() is called as well
+        self._finished.connect(self._deliver)
+
+    def request(self, func, *args, **kwargs):
+        """Render `func(*args, **kwargs)`. Arguments are read off the UI
+        thread, so pass values rather than widgets."""
+        with self._lock:
+            self._generation += 1
+            job = (self._generation, func, args, kwargs)
+            if self._running:
+                self._pending = job
+                return
+            self._running = True
+        self._pool.submit(self._run, job, lane=LANE_INTERACTIVE, priority=1)
+
+    def cancel(self):
+        """Drop the pending request and discard the one in flight."""
+        with self._lock:
+            self._floor = self._generation
+            self._pending = None
+
+    def shutdown(self):
+        self.cancel()
+
+    def _run(self, job):
+        while job is not None:
+            generation, func, args, kwargs = job
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                result = None
+            with self._lock:
+                current = generation > self._floor
+                job, self._pending = self._pending, None
+                if job is None:
+                    self._running = False
+            if current and result is not None:
+                try:
+                    self._finished.emit(generation, result)
+                except RuntimeError:
+                    # the owning widget was closed while this render was running
+                    pass
+
+    def _deliver(self, generation, result):
+        if generation <= max(self._floor, self._shown):
+            return
+        self._shown = generation
+        now = time.perf_counter()
+        self._times.append(now)
+        while self._times and now - self._times[0] > self.window:
+            self._times.popleft()
+        span = now - self._times[0]
+        self.fps = (len(self._times) - 1) / span if span > 0 else 0.0
+        self.ready.emit(result)
+        self.fps_changed.emit(self.fps)
@@ -1,23 +1,168 @@
-from PyQt5.QtCore import QThread, pyqtSignal
+from PyQt5.QtCore import QThreadPool, QRunnable, QObject, Qt, pyqtSignal
+import threading
 import traceback
 import sys
+import os
 
 
-class Worker(QThread):
+LANE_INTERACTIVE = 'interactive'
+LANE_BATCH = 'batch'
+
+
+class TaskCancelled(Exception):
+    pass
+
+
+class CancelToken:
+    """Set once from any thread; long running functions poll it."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def check(self):
+        if self._event.is_set():
+            raise TaskCancelled()
+
+
+class Task(QObject):
+    """Handle for one submitted call. Exactly one of `finished`, `error`
+    or `cancelled` is emitted, always on the UI thread."""
     finished = pyqtSignal(object)
     error = pyqtSignal(tuple)
     progress = pyqtSignal(int)
+    cancelled = pyqtSignal()
 
-    def __init__(self, func, *args, **kwargs):
-        super().__init__()
+    def __init__(self, pool, func, args, kwargs, key=None, lane=LANE_INTERACTIVE):
+        super().__init__(pool)
         self.func = func
         self.args = args
         self.kwargs = kwargs
+        self.key = key
+        self.lane = lane
+        self.token = CancelToken()
+        self.done = False
+        self._pool = pool
+
+    def cancel(self):
+        self.token.cancel()
+
+    def report(self, value):
+        """Progress callback for the running function (any thread)."""
+        self._pool._event.emit(self, 'progress', int(value))
+
+
+class _Runnable(QRunnable):
+    def __init__(self, task):
+        super().__init__()
+        self.task = task
 
     def run(self):
+        task = self.task
+        pool = task._pool
+        if task.token.cancelled:
+            pool._event.emit(task, 'cancelled', None)
+            return
         try:
-            result = self.func(*self.args, **self.kwargs)
-            self.finished.emit(result)
+            result = task.func(*task.args, **task.kwargs)
+            pool._event.emit(task, 'finished', result)
+        except TaskCancelled:
+            pool._event.emit(task, 'cancelled', None)
         except Exception:
             exc_type, exc_val = sys.exc_info()[:2]
-            self.error.emit((exc_type, exc_val, traceback.format_exc()))
+            pool._event.emit(task, 'error', (exc_type, exc_val, traceback.format_exc()))
+
+
+class TaskPool(QObject):
+    """Runs calls on shared, reusable threads instead of one QThread each.
+
+    Every lane has its own QThreadPool, so quick interactive work never
+    waits behind a long batch job; within a lane, higher `priority` starts
+    first. Submitting a `key` that is already queued or running returns
+    the existing task instead of computing the same result twice.
+
+    With `cooperative=True` the function also gets `token=` (a CancelToken
+    to poll) and `progress=` (a callback taking 0-100). Other functions
+    can't be stopped midway, but once cancelled their result is dropped
+    and `cancelled` is emitted instead of `finished`.
+    """
+    _event = pyqtSignal(object, str, object)
+    _shared = None
+
+    def __init__(self, parent=None, workers=None):
+        super().__init__(parent)
+        workers = workers or os.cpu_count() or 1
+        self._lanes = {}
+        for lane, count in ((LANE_INTERACTIVE, workers), (LANE_BATCH, max(1, workers - 1))):
+            pool = QThreadPool(self)
+            pool.setMaxThreadCount(count)
+            self._lanes[lane] = pool
+        self._active = {}
+        self._tasks = set()
+        # tasks only change state on the UI thread, so callers can connect
+        # to a task's signals right after submit() without missing anything
+        self._event.connect(self._dispatch, Qt.QueuedConnection)
+
+    @classmethod
+    def instance(cls):
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    def submit(self, func, *args, lane=LANE_INTERACTIVE, priority=0, key=None,
+               cooperative=False, **kwargs):
+        if lane not in self._lanes:
+            raise ValueError(f"Unknown lane: {lane}")
+        if key is not None:
+            task = self._active.get(key)
+            if task is not None and not task.token.cancelled:
+                return task
+        task = Task(self, func, args, kwargs, key, lane)
+        if cooperative:
+            task.kwargs = dict(kwargs, token=task.token, progress=task.report)
+        if key is not None:
+            self._active[key] = task
+        self._tasks.add(task)
+        self._lanes[lane].start(_Runnable(task), priority)
+        return task
+
+    def cancel_all(self, lane=None):
+        for task in list(self._tasks):
+            if lane is None or task.lane == lane:
+                task.cancel()
+
+    def pending(self, lane=None):
+        return sum(1 for t in self._tasks if lane is None or t.lane == lane)
+
+    def shutdown(self, wait_ms=-1):
+        self.cancel_all()
+        for pool in self._lanes.values():
+            pool.clear()
+            pool.waitForDone(wait_ms)
+
+    def _dispatch(self, task, kind, payload):
+        if task.done:
+            return
+        if kind == 'progress':
+            if not task.token.cancelled:
+                task.progress.emit(payload)
+            return
+        task.done = True
+        self._tasks.discard(task)
+        if task.key is not None and self._active.get(task.key) is task:
+            del self._active[task.key]
+        if kind == 'finished' and task.token.cancelled:
+            kind = 'cancelled'
+        if kind == 'finished':
+            task.finished.emit(payload)
+        elif kind == 'error':
+            task.error.emit(payload)
+        else:
+            task.cancelled.emit()
+        task.deleteLater()